@@ -1,36 +1,104 @@
 import streamlit as st
-import pandas as pd
 import time
+import datetime
 
-# --- PAGE CONFIGURATION ---
-st.set_page_config(
-    page_title="AI Railway Traffic Control DSS",
-    page_icon="🚆",
-    layout="wide",
-    initial_sidebar_state="expanded"
+from app_shell import (
+    live_feed, live_timetable, load_audit_store, load_capacity_engine, load_compute_cache, load_detector, load_dispatcher,
+    load_eta_predictor, load_optimizer, load_rollups, page_shell, replay_controls,
 )
+from audit_store import AI_RECOMMENDATION, CONTROLLER, MANUAL_OVERRIDE, SYSTEM_USER, USER_ACTION, log_line
+from commands import ACCEPT, ACKNOWLEDGED, MANUAL_ACTIONS, NOT_SENT, QUEUED, REJECT, make_command
+from conflicts import CONFLICT_LOOKAHEAD
+from feed import LIVE_REFRESH, RECOMMENDATION_REFRESH, STALE_AFTER, UI_REFRESH, event_details, section_kpis, train_rows
+from instrumentation import timed
+from network import UTILIZATION_LIMIT
+from sharding import SECTIONS
+
+# --- PAGE CONFIGURATION & SHARED STYLES ---
+page_shell()
+
+# --- LIVE SECTION STATE ---
+# Widgets below read the newest feed snapshot and refresh as fragments, so the rest of
+# the page is not rerun on every feed tick. A sharded division has a section selector;
+# the page then attaches to that section's worker. "Historical replay" in the sidebar
+# shows a recorded day instead of the live feed.
+section = st.sidebar.selectbox("Section", SECTIONS, key="section") if SECTIONS else None
+replay = replay_controls(section)
+timetable = live_timetable(section)
+feed = replay or live_feed(section)
+sharded = bool(section) and replay is None   # in replay, conflicts and plans are worked out here
+store = load_audit_store()
+cache = load_compute_cache()
+dispatcher = load_dispatcher()
+
+
+def clock():
+    return datetime.datetime.fromtimestamp(replay.clock()) if replay else datetime.datetime.now()
+
+
+def minutes_now():
+    now = clock()
+    return now.hour * 60 + now.minute
+
+
+def current_conflicts(snapshot):
+    if sharded:
+        return feed.conflicts     # detected in the section's worker with this snapshot
+    minutes = minutes_now()
+
+    def detect():
+        detector = replay.detector if replay else load_detector(section)
+        detector.sync(timetable, snapshot.delays())
+        return detector.upcoming(minutes, CONFLICT_LOOKAHEAD)
+
+    return cache.get(("conflicts", section, snapshot.version, minutes), detect)
+
+
+def current_prediction(snapshot):
+    minutes = minutes_now()
+    predictor = replay.predictor if replay else load_eta_predictor(section)
+    return cache.get(("eta", section, snapshot.version, minutes), lambda: predictor.update(snapshot, minutes))
+
+
+def current_capacity(snapshot, prediction):
+    minutes = minutes_now()
+    engine = replay.capacity if replay else load_capacity_engine(section)
+    return cache.get(("capacity", section, snapshot.version, minutes), lambda: engine.update(prediction.arr, prediction.dep))
 
-# --- SHARED STYLES ---
-st.markdown("""
-    <style>
-        .stApp { background-color: #0E1117; }
-        .stMetric { border: 1px solid #262730; border-radius: 10px; padding: 15px; background-color: #1a1c22; box-shadow: 0 4px 8px 0 rgba(0,0,0,0.2); }
-        .stButton>button { width: 100%; border-radius: 8px; }
-        .st-emotion-cache-1r6slb0 { border-radius: 10px; border: 1px solid #262730; }
-    </style>
-""", unsafe_allow_html=True)
 
 # --- HEADER SECTION ---
-col1, col2, col3, col4 = st.columns([4, 1, 1, 1])
-with col1:
-    st.title("Live Operations Dashboard")
-with col2:
-    st.metric(label="Status", value="● LIVE", help="Real-time data feed is active.")
-with col3:
-    st.metric(label="Punctuality", value="94.2%", delta="0.2%", help="Percentage of trains on time.")
-with col4:
-    st.metric(label="Avg. Delay", value="2.8m", delta="-0.1m", delta_color="inverse", help="Average delay across all trains in the section.")
+@st.fragment(run_every=UI_REFRESH)
+@timed("header_metrics")
+def live_header():
+    snapshot = feed.latest
+    upcoming_conflicts = current_conflicts(snapshot)
+    prediction = current_prediction(snapshot)
+    punctuality, avg_delay = cache.get(
+        ("section_kpis", section, snapshot.version, minutes_now()), lambda: section_kpis(snapshot, prediction.exit_delays(snapshot))
+    )
+    reference = cache.get(("kpi_reference",), lambda: load_rollups().totals("hour", time.time() - 86400))
+    line, line_name, utilization = current_capacity(snapshot, prediction).now(minutes_now())
+    booked_utilization = load_capacity_engine(section).reference.at(line, minutes_now())
+    col1, col2, col3, col4, col5, col6 = st.columns([4, 1, 1, 1, 1, 1])
+    with col1:
+        st.title("Live Operations Dashboard")
+    with col2:
+        if replay:
+            st.metric(label="Status", value="⏵ REPLAY" if replay.playing else "⏸ PAUSED", help=f"Recorded feed at {clock():%d %b %H:%M:%S}, {replay.speed}× speed.")
+        elif feed.lag < STALE_AFTER:
+            st.metric(label="Status", value="● LIVE", help="Real-time data feed is active.")
+        else:
+            st.metric(label="Status", value="○ STALE", help=f"No feed message for over {STALE_AFTER:.0f} seconds.")
+    with col3:
+        st.metric(label="Punctuality", value=f"{punctuality:.1f}%", delta=f"{punctuality - reference[0]:.1f}%" if reference else None, help="Percentage of trains on time, change against the last 24 hours.")
+    with col4:
+        st.metric(label="Avg. Delay", value=f"{avg_delay:.1f}m", delta=f"{avg_delay - reference[1]:.1f}m" if reference else None, delta_color="inverse", help="Average delay across all trains in the section, change against the last 24 hours.")
+    with col5:
+        st.metric(label="Capacity Use", value=f"{utilization:.0f}%", delta=f"{utilization - booked_utilization:.1f}%", delta_color="inverse", help=f"UIC 406 occupancy of the busiest block line this hour ({line_name}), change against the timetable. Above {UTILIZATION_LIMIT:.0f}% there is too little slack to recover delays.")
+    with col6:
+        st.metric(label="Potential Conflicts", value=str(len(upcoming_conflicts)), help=f"Headway conflicts projected in the next {CONFLICT_LOOKAHEAD // 60} hours.")
 
+live_header()
 st.divider()
 
 # --- MAIN LAYOUT ---
@@ -39,56 +107,167 @@ left_column, right_column = st.columns([1, 2])
 # --- LEFT COLUMN: Recommendations & Manual Control ---
 with left_column:
     st.subheader("🤖 AI Recommendation")
-    with st.container(border=True):
-        st.info("Hold Train **45678 (Freight)** at **Siding SL-02** for **6 minutes**.")
-        st.caption("REASON: To allow high-priority Train 12301 (Rajdhani) to pass, preventing a projected 15-minute delay.")
-        
-        rec_col1, rec_col2 = st.columns(2)
-        if rec_col1.button("✅ Accept", type="primary", use_container_width=True):
-            st.toast("✅ Recommendation Accepted! Executing action.", icon="👍")
-        if rec_col2.button("❌ Reject", use_container_width=True):
-            st.toast("❌ Recommendation Rejected. Awaiting manual override.", icon="👎")
+
+    @st.fragment(run_every=RECOMMENDATION_REFRESH)
+    @timed("recommendation")
+    def recommendation_panel():
+        snapshot = feed.latest
+        upcoming_conflicts = current_conflicts(snapshot)
+        budget_ms = st.session_state.get("optimizer_budget", 300)
+        minutes = minutes_now()
+        if sharded:
+            optimizer = feed      # solved in the section's worker
+            plan = feed.recommendation(budget_ms)
+        else:
+            optimizer = replay.optimizer if replay else load_optimizer()
+            plan = cache.get(
+                ("recommendation", id(optimizer), snapshot.version, minutes, budget_ms, len(optimizer.rejected)),
+                lambda: optimizer.solve(timetable, snapshot.delays(), minutes, upcoming_conflicts, budget_ms=budget_ms),
+            )
+        recommendation = plan.explanation
+
+        # Button callbacks run on the next rerun, before the panel solves again, with the
+        # recommendation that was on screen when the button was clicked.
+        def accept(shown, hold):
+            outcome = dispatcher.submit(make_command(ACCEPT, shown['train'], hold, section=section))
+            if outcome == QUEUED:
+                store.record(CONTROLLER, USER_ACTION, f"Accepted AI Recommendation for Train {shown['train']}.")
+                st.toast("✅ Recommendation Accepted! Executing action.", icon="👍")
+            else:
+                st.toast(NOT_SENT[outcome], icon="⚠️")
+
+        def reject(shown, hold):
+            optimizer.reject(shown['train'], shown['node'])
+            outcome = dispatcher.submit(make_command(REJECT, shown['train'], hold, section=section))
+            if outcome == QUEUED:
+                store.record(CONTROLLER, USER_ACTION, f"Rejected AI Recommendation for Train {shown['train']}.")
+                st.toast("❌ Recommendation Rejected. Awaiting manual override.", icon="👎")
+            else:
+                st.toast(NOT_SENT[outcome], icon="⚠️")
+
+        if recommendation and replay is None:   # a replayed recommendation was recorded when it was live
+            store.record_change(
+                ("recommendation", section), (recommendation['train'], recommendation['node'], recommendation['minutes']),
+                SYSTEM_USER, AI_RECOMMENDATION,
+                f"Hold Train {recommendation['train']} at {recommendation['node_label']} for {recommendation['minutes']} mins.",
+            )
+        with st.container(border=True):
+            if recommendation:
+                st.info(f"Hold Train **{recommendation['train']} ({recommendation['type']})** at **{recommendation['node_label']}** for **{recommendation['minutes']} minutes**.")
+                if recommendation['for_train']:
+                    st.caption(f"REASON: To allow higher-priority Train {recommendation['for_train']} ({recommendation['for_type']}) to pass, preventing a projected {max(recommendation['saved'], 0):.0f}-minute delay.")
+                else:
+                    st.caption(f"REASON: Cuts projected delay in the section by {max(recommendation['saved'], 0):.0f} minutes.")
+                
+                rec_col1, rec_col2 = st.columns(2)
+                hold = f"hold at {recommendation['node_label']} for {recommendation['minutes']} mins"
+                rec_col1.button(
+                    "✅ Accept", type="primary", use_container_width=True, disabled=replay is not None,
+                    on_click=accept, args=(recommendation, hold),
+                )
+                rec_col2.button(
+                    "❌ Reject", use_container_width=True, disabled=replay is not None,
+                    on_click=reject, args=(recommendation, hold),
+                )
+            elif upcoming_conflicts:
+                st.success(f"No hold improves on normal priority working. {len(upcoming_conflicts)} projected conflicts resolve without intervention.")
+            else:
+                st.success(f"No conflicts projected in the next {CONFLICT_LOOKAHEAD // 60} hours. No action needed.")
+            st.caption(
+                f"Solved in {plan.solve_ms:.0f} ms · objective gap {plan.gap:.0%} · {plan.evaluations} plans evaluated · "
+                f"{'warm' if plan.warm_start else 'cold'} start{'' if plan.converged else ' · time budget reached'}"
+            )
+            with st.expander("Optimizer settings"):
+                st.slider("Time budget (ms)", 50, 2000, 300, step=50, key="optimizer_budget")
+
+    recommendation_panel()
 
     st.subheader("🕹️ Manual Override")
     with st.container(border=True):
         st.text_input("Train ID", placeholder="e.g., 12301", key="manual_train_id")
-        st.selectbox("Action", ["Proceed Via Main Line", "Hold at Next Station", "Route to Siding"], key="manual_action")
-        if st.button("Execute Command", type="primary", use_container_width=True):
-            st.success("Manual command sent successfully!")
+        st.selectbox("Action", MANUAL_ACTIONS, key="manual_action")
+        if st.button("Execute Command", type="primary", use_container_width=True, disabled=replay is not None):
+            try:
+                command = make_command(st.session_state.manual_action, st.session_state.manual_train_id, section=section, known=feed.latest.ids)
+            except ValueError as error:
+                st.error(str(error))
+            else:
+                outcome = dispatcher.submit(command)
+                if outcome == QUEUED:
+                    store.record(CONTROLLER, MANUAL_OVERRIDE, f"Executed '{command.action}' for Train {command.train}.")
+                    st.success("Manual command sent. Acknowledgement shows below.")
+                else:
+                    st.warning(NOT_SENT[outcome])
+
+        # Sent from a queue off the script thread; acknowledgements arrive in the background.
+        @st.fragment(run_every=UI_REFRESH)
+        @timed("command_status")
+        def command_status():
+            for command in dispatcher.recent():
+                ack = f" in {command.latency * 1000:.0f} ms" if command.status == ACKNOWLEDGED else ""
+                st.caption(f"{log_line(command.issued, command.describe())} · {command.status}{ack}")
+
+        command_status()
             
     st.subheader("📜 Event Log")
-    with st.container(border=True, height=220):
-        st.text("[11:39:35] System Initialized. Awaiting controller input.")
-        st.text("[11:39:35] AI recommendation generated.")
-        st.text("[11:39:22] Train 12301 departed Station A.")
-        st.text("[11:38:50] Train 45678 approaching Siding SL-02.")
-        st.text("[11:37:15] Train 20825 arrived at Station B.")
+
+    @st.fragment(run_every=UI_REFRESH)
+    @timed("event_log")
+    def event_log():
+        with st.container(border=True, height=220):
+            if replay:   # the train events of the replayed feed, newest first
+                for ts, train, event, node in reversed(feed.latest.events):
+                    st.text(log_line(ts, event_details(train, event, node)))
+            else:
+                for _, ts, _, _, details in cache.get(("event_log",), lambda: store.page(limit=50), ttl=1.0):
+                    st.text(log_line(ts, details))
+
+    event_log()
 
 # --- RIGHT COLUMN: Map & Train List ---
 with right_column:
     st.subheader("🗺️ Network Visualization")
-    # MODIFICATION: Replaced broken URL and updated parameter to use_container_width.
-    st.image(
-        "Live_map.jpg",
-        caption="Live network view showing train positions between Station A and Station B.",
-        use_container_width=True
-    )
+
+    @st.fragment(run_every=LIVE_REFRESH)
+    @timed("network_diagram")
+    def network_diagram():
+        # numpy/plotly are first imported here, once the header and recommendation have painted.
+        from string_diagram import WINDOWS, live_diagram
+        span = WINDOWS[st.select_slider("Time window", list(WINDOWS), value="2 h", key="live_window")]
+        snapshot = feed.latest
+        now = clock()
+        minutes = now.hour * 60 + now.minute + now.second / 60
+        fig = cache.get(
+            ("live_diagram", section, snapshot.version, span),
+            lambda: live_diagram(
+                timetable, snapshot, minutes, span, conflicts=current_conflicts(snapshot), prediction=current_prediction(snapshot),
+            ),
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption("Live time-distance diagram: predicted paths ahead of each train, with headway knock-on, train positions now and projected conflicts.")
+
+    network_diagram()
 
     st.subheader("📋 Train List (In Section)")
-    
-    train_data = {
-        'ID': ['12301', '45678', '20825', '12859', '54321'],
-        'TYPE': ['Rajdhani', 'Freight', 'Express', 'Express', 'Local'],
-        'NEXT STOP': ['Raipur', 'Nagpur', 'Durg', 'Nagpur', 'Durg'],
-        'ETA': ['16:45', '17:10', '16:22', '18:05', '17:30'],
-        'STATUS': ['On Time', 'Delayed 6m', 'Early 3m', 'On Time', 'Delayed 12m']
-    }
-    df = pd.DataFrame(train_data)
-    
-    # MODIFICATION: Updated parameter to use_container_width for the dataframe.
-    st.dataframe(
-        df,
-        use_container_width=True,
-        hide_index=True,
-    )
+
+    @st.fragment(run_every=UI_REFRESH)
+    @timed("train_list")
+    def train_list():
+        import pandas as pd   # loaded with the first train list, after the page has painted
+        snapshot = feed.latest
+        prediction = current_prediction(snapshot)
+        df = cache.get(
+            ("train_list", section, snapshot.version, minutes_now()), lambda: pd.DataFrame(train_rows(snapshot, timetable, prediction))
+        )
+        
+        # MODIFICATION: Updated parameter to use_container_width for the dataframe.
+        st.dataframe(
+            df,
+            use_container_width=True,
+            hide_index=True,
+        )
+        handed_over = f" · {len(feed.incoming)} handed over from neighbouring sections" if sharded else ""
+        st.caption(f"Snapshot v{snapshot.version} · {len(snapshot.ids)} trains in section{handed_over}")
+
+    train_list()
 
@@ -0,0 +1,215 @@
+import datetime
+
+import streamlit as st
+
+from audit_store import COMMAND_DISPATCH, SYSTEM_USER, TRAIN_EVENT, AuditStore
+from commands import CommandDispatcher, LocalSink, outcome_details
+from compute_cache import ComputeCache
+from conflicts import ConflictDetector
+from export import start_export_server
+from feed import FEED_LOG, FeedIngest, FeedRecorder, event_details, source_from_env
+from instrumentation import start_metrics_server
+from optimizer import HoldOptimizer
+from rollups import KpiRollups
+from scenario_cache import ScenarioCache
+from sharding import SECTIONS, Division, shard_log_name
+from simulation import run_baseline
+from timetable_loader import working_timetable
+
+# --- APP SHELL ---
+# Imported once per process by app.py and every page script. Keeping the page config,
+# styles and resource loaders here means each rerun only re-emits two small elements,
+# and every page shares one feed, store and cache instead of one per script.
+# Heavy libraries (plotly, numpy) are not imported here; pages import them where used.
+PAGE_CONFIG = {
+    "page_title": "AI Railway Traffic Control DSS",
+    "page_icon": "🚆",
+    "layout": "wide",
+    "initial_sidebar_state": "expanded",
+}
+
+STYLES = """
+    <style>
+        .stApp { background-color: #0E1117; }
+        .stMetric { border: 1px solid #262730; border-radius: 10px; padding: 15px; background-color: #1a1c22; box-shadow: 0 4px 8px 0 rgba(0,0,0,0.2); }
+        .stButton>button { width: 100%; border-radius: 8px; }
+        /* Style for containers */
+        .st-emotion-cache-1r6slb0 { border-radius: 10px; border: 1px solid #262730; }
+    </style>
+"""
+
+
+def page_shell(**config):
+    """Page config and shared styles; the first call of every page script."""
+    st.set_page_config(**{**PAGE_CONFIG, **config})
+    st.markdown(STYLES, unsafe_allow_html=True)
+    load_metrics_server()
+
+
+# --- SHARED DATA ---
+@st.cache_resource
+def load_metrics_server():
+    return start_metrics_server()
+
+
+@st.cache_resource
+def load_timetable():
+    return working_timetable()
+
+
+@st.cache_resource
+def load_compute_cache():
+    return ComputeCache()
+
+
+@st.cache_resource
+def load_baseline():
+    return run_baseline(load_timetable())
+
+
+@st.cache_resource
+def load_scenario_cache():
+    return ScenarioCache()
+
+
+@st.cache_resource
+def load_detector(section=None):
+    return ConflictDetector()
+
+
+@st.cache_resource
+def load_optimizer():
+    return HoldOptimizer()
+
+
+@st.cache_resource
+def load_eta_predictor(section=None):
+    from eta import EtaPredictor   # numpy, imported with the first Live Operations prediction
+    return EtaPredictor(live_timetable(section))
+
+
+@st.cache_resource
+def load_capacity_engine(section=None):
+    from capacity import CapacityEngine   # numpy, as for the ETA predictor
+    return CapacityEngine(live_timetable(section))
+
+
+@st.cache_resource
+def load_baseline_capacity():
+    from capacity import CapacityEngine
+    baseline = load_baseline()
+    return CapacityEngine(load_timetable(), baseline.arr, baseline.dep)
+
+
+@st.cache_resource
+def load_audit_store():
+    return AuditStore().start()
+
+
+@st.cache_resource
+def load_rollups():
+    return KpiRollups().start()
+
+
+@st.cache_resource
+def load_export_server():
+    return start_export_server(load_audit_store(), load_rollups())
+
+
+def train_event_recorder():
+    store = load_audit_store()
+    rollups = load_rollups()
+
+    def record_train_events(events):
+        store.record_many([(ts, SYSTEM_USER, TRAIN_EVENT, event_details(train, event, node)) for ts, train, event, node, _ in events])
+        rollups.add_feed_events(events)
+
+    return record_train_events
+
+
+@st.cache_resource
+def load_feed():
+    return FeedIngest(
+        source_from_env(load_timetable()), on_events=train_event_recorder(),
+        recorder=FeedRecorder() if FEED_LOG else None,
+    ).start()
+
+
+@st.cache_resource
+def load_division():
+    return Division(SECTIONS, on_events=train_event_recorder()).start()
+
+
+@st.cache_resource
+def load_dispatcher():
+    store = load_audit_store()
+    return CommandDispatcher(
+        LocalSink(), on_done=lambda command: store.record(command.user, COMMAND_DISPATCH, outcome_details(command)),
+    ).start()
+
+
+# --- SECTION SELECTION ---
+# With RAILWAY_SECTIONS set, the Live page attaches to the selected section's worker
+# process; otherwise (section None) to the in-process feed.
+def live_feed(section=None):
+    return load_division().shards[section] if section else load_feed()
+
+
+def live_timetable(section=None):
+    return load_division().shards[section].timetable if section else load_timetable()
+
+
+# --- HISTORICAL REPLAY ---
+# Sidebar controls that put a recorded day (replay.py) in place of the live feed. The
+# day's index is shared by every session; each session plays, pauses and seeks its own
+# ReplayFeed.
+@st.cache_resource
+def load_replay_index(path):
+    from replay import ReplayIndex
+    return ReplayIndex(path)
+
+
+def replay_controls(section=None):
+    """The ReplayFeed the Live page should show, or None for the live feed."""
+    from replay import SPEEDS, ReplayFeed, log_path, recorded_days
+    name = shard_log_name(SECTIONS.index(section)) if section else ""
+    with st.sidebar:
+        st.divider()
+        if not st.toggle("Historical replay", key="replay_mode"):
+            return None
+        if not FEED_LOG:
+            st.caption("Feed recording is off (RAILWAY_FEED_LOG is empty).")
+            return None
+        days = recorded_days(name)
+        if not days:
+            st.caption("No recorded days yet. The feed is recorded while the dashboard runs.")
+            return None
+        day = st.selectbox("Day", days, key="replay_day")
+        index = load_replay_index(log_path(day, name)).extend()   # today's log is still growing
+        if index.start is None:
+            st.caption("Nothing recorded on this day yet.")
+            return None
+        replay = st.session_state.get("replay_feed")
+        if replay is None or replay.index is not index:
+            replay = st.session_state.replay_feed = ReplayFeed(index, live_timetable(section))
+            st.session_state.pop("replay_scrubber", None)
+
+        start, end = (datetime.datetime.fromtimestamp(ts).replace(microsecond=0) for ts in (index.start, index.end))
+        if replay.playing or "replay_scrubber" not in st.session_state:
+            clock = datetime.datetime.fromtimestamp(replay.clock()).replace(microsecond=0)
+            st.session_state.replay_scrubber = min(max(clock, start), end)
+        st.slider(
+            "Replay time", min_value=start, max_value=max(end, start + datetime.timedelta(seconds=1)),
+            step=datetime.timedelta(seconds=30), format="HH:mm:ss", key="replay_scrubber",
+            on_change=lambda: replay.seek(st.session_state.replay_scrubber.timestamp()),
+        )
+        speed = st.select_slider("Speed", SPEEDS, value=replay.speed, format_func=lambda s: f"{s}×", key="replay_speed")
+        if speed != replay.speed:
+            replay.set_speed(speed)
+        if st.button("⏸ Pause" if replay.playing else "▶ Play", use_container_width=True):
+            if replay.playing:
+                replay.pause()
+            else:
+                replay.play()
+            st.rerun()
+    return replay
@@ -0,0 +1,204 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+AUDIT_DB = os.environ.get(
+    "RAILWAY_AUDIT_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "audit.db")
+)
+PAGE_SIZE = 100
+EXPORT_CHUNK = 10_000   # rows per read when streaming an export
+FLUSH_INTERVAL = 0.5   # seconds the writer waits to batch appends into one transaction
+FACETS = ("user", "event_type")
+
+SYSTEM_USER = "SYSTEM"
+CONTROLLER = os.environ.get("RAILWAY_CONTROLLER", "Controller_A")
+
+# Event types, as shown in the Audit Trail "Event Type" column.
+AI_RECOMMENDATION = "AI Recommendation"
+USER_ACTION = "User Action"
+MANUAL_OVERRIDE = "Manual Override"
+TRAIN_EVENT = "Train Event"
+COMMAND_DISPATCH = "Command Dispatch"   # acknowledgement (or not) of a controller command
+
+# --- SCHEMA ---
+# Append-only. `id` is the rowid, so every index below also orders by it and newest-first
+# pages can be read straight off an index whatever filter is applied. Distinct users and
+# event types live in their own small table, maintained on insert, so the filter
+# dropdowns never scan the events.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    user TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+    details TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_user_ts ON events (user, ts);
+CREATE INDEX IF NOT EXISTS events_type_ts ON events (event_type, ts);
+CREATE INDEX IF NOT EXISTS events_user_type_ts ON events (user, event_type, ts);
+CREATE TABLE IF NOT EXISTS facets (
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (field, value)
+) WITHOUT ROWID;
+"""
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+# --- AUDIT STORE ---
+# SQLite in WAL mode: page reruns read through their own connections while a single
+# writer thread commits appends in batches, so neither the feed nor a button click ever
+# waits on disk.
+class AuditStore:
+    def __init__(self, path=AUDIT_DB):
+        self.path = path
+        self.pending = queue.Queue()
+        self.local = threading.local()
+        self.writer = None
+        self.lock = threading.Lock()
+        self.last = {}   # channel -> value last recorded through record_change
+        self.last_lock = threading.Lock()   # not self.lock: a click should not wait on the writer's transaction
+        conn = connect(path)
+        conn.executescript(SCHEMA)
+        self.facets = {field: frozenset() for field in FACETS}
+        for field, value in conn.execute("SELECT field, value FROM facets"):
+            self.facets[field] |= {value}
+        conn.close()
+
+    def start(self):
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._write_loop, name="audit-writer", daemon=True)
+            self.writer.start()
+            atexit.register(self.flush)
+        return self
+
+    # --- WRITES ---
+    def record(self, user, event_type, details, ts=None):
+        """Queue one audit row; returns immediately."""
+        self.pending.put([(time.time() if ts is None else ts, user, event_type, details)])
+
+    def record_change(self, channel, value, user, event_type, details):
+        """Queue a row only if `value` differs from the last one recorded on `channel`.
+
+        For state every session on the page sees, such as a section's current
+        recommendation: it is recorded once per process however many sessions show it.
+        Returns whether a row was queued.
+        """
+        with self.last_lock:
+            if self.last.get(channel) == value:
+                return False
+            self.last[channel] = value
+        self.record(user, event_type, details)
+        return True
+
+    def record_many(self, rows):
+        """Queue [(ts, user, event_type, details), ...] as a single batch."""
+        if rows:
+            self.pending.put(list(rows))
+
+    def flush(self, batches=None):
+        """Write everything queued so far (the writer thread does this every FLUSH_INTERVAL)."""
+        batches = batches or []
+        while True:
+            try:
+                batches.append(self.pending.get_nowait())
+            except queue.Empty:
+                break
+        if batches:
+            self.append([row for batch in batches for row in batch])
+
+    def append(self, rows):
+        """Insert rows in one transaction on the calling thread."""
+        with self.lock:
+            conn = self._connection()
+            new = []
+            with conn:
+                conn.executemany("INSERT INTO events (ts, user, event_type, details) VALUES (?, ?, ?, ?)", rows)
+                for field, column in zip(FACETS, (1, 2)):
+                    for value in {row[column] for row in rows} - self.facets[field]:
+                        new.append((field, value))
+                conn.executemany("INSERT OR IGNORE INTO facets (field, value) VALUES (?, ?)", new)
+            # Replaced rather than mutated so readers on other threads never see a set change.
+            for field, value in new:
+                self.facets[field] = self.facets[field] | {value}
+
+    def _write_loop(self):
+        while True:
+            batches = [self.pending.get()]
+            time.sleep(FLUSH_INTERVAL)
+            self.flush(batches)
+
+    # --- READS ---
+    def _connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = connect(self.path)
+        return conn
+
+    def distinct(self, field):
+        """Sorted values seen for a facet ("user" or "event_type"), for filter dropdowns."""
+        return sorted(self.facets[field])
+
+    def page(self, user=None, event_type=None, before=None, limit=PAGE_SIZE, since=None):
+        """Newest-first rows (id, ts, user, event_type, details) matching the filters.
+
+        `before` is the (ts, id) of the last row of the previous page; paging by key
+        instead of OFFSET keeps every page as cheap as the first one.
+        """
+        return select_page(self._connection(), user, event_type, since, before, limit)
+
+    def scan(self, user=None, event_type=None, since=None, chunk=EXPORT_CHUNK):
+        """Every row matching the filters, newest first, in lists of up to `chunk` rows.
+
+        For exports: pages by key through a connection of its own, one short read per
+        chunk, so however long the consumer takes no read transaction stays open and the
+        writer can keep checkpointing the WAL.
+        """
+        conn = connect(self.path)
+        try:
+            before = None
+            while True:
+                rows = select_page(conn, user, event_type, since, before, chunk)
+                if rows:
+                    yield rows
+                if len(rows) < chunk:
+                    return
+                before = (rows[-1][1], rows[-1][0])
+        finally:
+            conn.close()
+
+
+def select_page(conn, user, event_type, since, before, limit):
+    where, args = [], []
+    if user is not None:
+        where.append("user = ?")
+        args.append(user)
+    if event_type is not None:
+        where.append("event_type = ?")
+        args.append(event_type)
+    if since is not None:
+        where.append("ts >= ?")
+        args.append(since)
+    if before is not None:
+        where.append("(ts, id) < (?, ?)")
+        args.extend(before)
+    sql = "SELECT id, ts, user, event_type, details FROM events"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+    return conn.execute(sql, args + [limit]).fetchall()
+
+
+def log_line(ts, details):
+    stamp = time.strftime("%H:%M:%S", time.localtime(ts))
+    return f"[{stamp}] {details}"
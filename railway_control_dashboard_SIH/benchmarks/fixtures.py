@@ -0,0 +1,90 @@
+import os
+import random
+import time
+
+from audit_store import (
+    AI_RECOMMENDATION, CONTROLLER, MANUAL_OVERRIDE, SYSTEM_USER, TRAIN_EVENT, USER_ACTION, AuditStore,
+)
+from feed import EVENTS, POS
+from network import NODES, TYPE_NAMES, path_nodes
+from rollups import KpiRollups
+
+# --- SYNTHETIC FIXTURES ---
+# Large stand-ins for a busy production day, written through the same stores the app
+# reads so the benchmark exercises the real indexes and rollup tables.
+AUDIT_USERS = [SYSTEM_USER, CONTROLLER] + [f"Controller_{c}" for c in "BCDEFGH"]
+AUDIT_TYPES = [TRAIN_EVENT] * 8 + [AI_RECOMMENDATION, USER_ACTION, MANUAL_OVERRIDE]
+BATCH = 200_000
+
+
+def build_audit_db(path, rows, days=30, seed=0):
+    """Fill the audit store at `path` with `rows` events spread over the last `days` days.
+
+    Reuses an existing fixture with at least that many rows.
+    """
+    store = AuditStore(path)
+    existing = store._connection().execute("SELECT COUNT(*) FROM events").fetchone()[0]
+    if existing >= rows:
+        return existing
+    rng = random.Random(seed)
+    start = time.time() - days * 86400
+    step = days * 86400 / rows
+    for first in range(existing, rows, BATCH):
+        batch = []
+        for k in range(first, min(first + BATCH, rows)):
+            train = rng.randint(10000, 99999)
+            batch.append((
+                start + k * step, rng.choice(AUDIT_USERS), rng.choice(AUDIT_TYPES),
+                f"Train {train} departed {rng.choice(NODES)['label']}.",
+            ))
+        store.append(batch)
+    return rows
+
+
+def build_kpi_history(path, days=30, per_minute=4, seed=0):
+    """Arrival observations every few seconds for the last `days` days, folded into the rollups."""
+    rollups = KpiRollups(path)
+    now = time.time()
+    covered = rollups._connection().execute(
+        "SELECT COUNT(*) FROM kpi_hour WHERE bucket >= ?", (now - days * 86400,)
+    ).fetchone()[0]
+    if covered >= days * 24 - 1:
+        return
+    rng = random.Random(seed)
+    observations = []
+    for k in range(days * 1440 * per_minute):
+        observations.append((now - days * 86400 + k * 60.0 / per_minute, rng.expovariate(1 / 3.0) - 1.0))
+        if len(observations) == BATCH:
+            rollups.add_many(observations)
+            observations = []
+    rollups.add_many(observations)
+    rollups.flush()
+
+
+def feed_lines(timetable, n_trains, seed=0):
+    """One position report each for `n_trains` trains in the section, timestamped now.
+
+    Timetabled trains come first so the Train List and diagram have ETAs for them; the
+    rest get synthetic ids.
+    """
+    rng = random.Random(seed)
+    now = time.time()
+    lines = []
+    for k in range(n_trains):
+        if k < len(timetable):
+            train, type_name, direction = timetable.ids[k], timetable.type_name(k), timetable.dirs[k]
+        else:
+            train, type_name, direction = f"9{k:05d}", rng.choice(TYPE_NAMES[:4]), rng.randint(0, 1)
+        path = path_nodes(direction)
+        k_next = rng.randint(1, len(path) - 1)
+        km = (NODES[path[k_next - 1]]["km"] + NODES[path[k_next]]["km"]) / 2
+        delay = 0.0 if rng.random() < 0.7 else round(rng.expovariate(1 / 6.0), 1)
+        lines.append(f"{now:.3f},{train},{type_name},{direction},{km:.2f},{path[k_next]},{delay},{EVENTS[POS]}")
+    return lines
+
+
+def append_feed(path, lines):
+    with open(path, "a", encoding="utf-8") as handle:
+        handle.write("\n".join(lines) + "\n")
+        handle.flush()
+        os.fsync(handle.fileno())
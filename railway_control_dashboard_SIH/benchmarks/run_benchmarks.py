@@ -0,0 +1,170 @@
+"""Headless rerun benchmarks for every dashboard page.
+
+Drives app.py (each page of its sidebar navigation) and the standalone page scripts with
+streamlit.testing's AppTest against large synthetic fixtures, and reports per-rerun
+latency percentiles and peak Python memory. Results are compared with baseline.json;
+a scenario slower or bigger than its baseline by more than --tolerance fails the run.
+
+    python benchmarks/run_benchmarks.py                   # compare with baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline   # record a new baseline
+    python benchmarks/run_benchmarks.py --audit-rows 1000000 --reruns 10   # quicker
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCH_DIR, ".fixtures")
+BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+# The app reads these when its modules are first imported, so set them before that.
+os.makedirs(FIXTURE_DIR, exist_ok=True)
+FEED_FILE = os.path.join(FIXTURE_DIR, "feed.csv")
+os.environ["RAILWAY_AUDIT_DB"] = os.path.join(FIXTURE_DIR, "audit.db")
+os.environ["RAILWAY_FEED"] = f"file://{FEED_FILE}"
+os.environ["RAILWAY_SCENARIO_CACHE"] = tempfile.mkdtemp(prefix="scenario-cache-")
+os.environ["RAILWAY_FEED_LOG"] = ""
+sys.path[:0] = [APP_DIR, BENCH_DIR]
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from fixtures import append_feed, build_audit_db, build_kpi_history, feed_lines  # noqa: E402
+from sweep import percentile  # noqa: E402
+from timetable import synthetic_timetable  # noqa: E402
+
+TIMEOUT = 120
+
+
+# --- SCENARIOS ---
+# name -> (script, interaction before the measured reruns). Interactions get the AppTest
+# after its first run and return nothing; the feed fixture is appended after that run,
+# once the script's feed thread has started tailing the file.
+def go_to(page):
+    def interact(at):
+        at.sidebar.radio[0].set_value(page).run()
+    return interact
+
+
+def set_select(key, value):
+    def interact(at):
+        at.selectbox(key=key).set_value(value).run()
+    return interact
+
+
+def click(label):
+    def interact(at):
+        next(button for button in at.button if button.label == label).click().run()
+    return interact
+
+
+def filter_audit(at):
+    at.selectbox[1].set_value("Controller_B").run()
+    at.selectbox[2].set_value("Manual Override").run()
+
+
+SCENARIOS = {
+    "app.py Live Operations": ("app.py", go_to("Live Operations")),
+    "app.py Simulation Studio": ("app.py", go_to("Simulation Studio")),
+    "app.py Performance & Audit": ("app.py", go_to("Performance & Audit")),
+    "1_Live_Operations.py": ("1_Live_Operations.py", None),
+    "2_Simulation_Studio.py": ("pages/2_Simulation_Studio.py", None),
+    "2_Simulation_Studio.py Run Simulation": ("pages/2_Simulation_Studio.py", click("🚀 Run Simulation")),
+    "3_Performance_Audit.py Last 24 Hours": ("pages/3_Performance_Audit.py", None),
+    "3_Performance_Audit.py Last 30 Days": ("pages/3_Performance_Audit.py", set_select("time_period", "Last 30 Days")),
+    "3_Performance_Audit.py filtered audit trail": ("pages/3_Performance_Audit.py", filter_audit),
+}
+
+
+def measure(script, interact, reruns, feed):
+    at = AppTest.from_file(os.path.join(APP_DIR, script), default_timeout=TIMEOUT)
+    at.run()
+    append_feed(FEED_FILE, feed)
+    time.sleep(1.0)   # let the feed thread ingest and publish the fixture
+    if interact is not None:
+        interact(at)
+    if at.exception:
+        raise RuntimeError(f"{script}: {at.exception[0].message}")
+
+    tracemalloc.start()
+    timings = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        at.run()
+        timings.append((time.perf_counter() - started) * 1000.0)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    if at.exception:
+        raise RuntimeError(f"{script}: {at.exception[0].message}")
+    return {
+        "p50_ms": percentile(timings, 50),
+        "p90_ms": percentile(timings, 90),
+        "p99_ms": percentile(timings, 99),
+        "max_ms": max(timings),
+        "peak_mb": peak / 2 ** 20,
+    }
+
+
+# --- BASELINE COMPARISON ---
+def regressions(results, baseline, tolerance):
+    found = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric in ("p90_ms", "peak_mb"):
+            if result[metric] > reference[metric] * (1.0 + tolerance):
+                found.append(f"{name}: {metric} {result[metric]:.1f} vs baseline {reference[metric]:.1f}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=30)
+    parser.add_argument("--trains", type=int, default=1000, help="trains in section in the feed fixture")
+    parser.add_argument("--audit-rows", type=int, default=10_000_000)
+    parser.add_argument("--kpi-days", type=int, default=30)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown/growth over baseline")
+    parser.add_argument("--only", help="run scenarios whose name contains this text")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    build_audit_db(os.environ["RAILWAY_AUDIT_DB"], args.audit_rows)
+    build_kpi_history(os.environ["RAILWAY_AUDIT_DB"], args.kpi_days)
+    open(FEED_FILE, "w").close()
+    feed = feed_lines(synthetic_timetable(), args.trains)
+    print(f"Fixtures ready in {time.perf_counter() - started:.1f} s "
+          f"({args.trains} trains in section, {args.audit_rows:,} audit rows, {args.kpi_days} days of KPIs)")
+
+    results = {}
+    print(f"{'scenario':46} {'p50':>8} {'p90':>8} {'p99':>8} {'peak MB':>8}")
+    for name, (script, interact) in SCENARIOS.items():
+        if args.only and args.only not in name:
+            continue
+        results[name] = result = measure(script, interact, args.reruns, feed)
+        print(f"{name:46} {result['p50_ms']:8.1f} {result['p90_ms']:8.1f} {result['p99_ms']:8.1f} {result['peak_mb']:8.1f}")
+    print(f"Process peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+    if args.save_baseline:
+        with open(BASELINE, "w") as handle:
+            json.dump(results, handle, indent=2, sort_keys=True)
+        print(f"Baseline saved to {BASELINE}")
+        return 0
+    if not os.path.exists(BASELINE):
+        print("No baseline.json yet; run with --save-baseline to record one.")
+        return 0
+    with open(BASELINE) as handle:
+        found = regressions(results, json.load(handle), args.tolerance)
+    for line in found:
+        print(f"REGRESSION {line}")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
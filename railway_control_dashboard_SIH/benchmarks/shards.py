@@ -0,0 +1,59 @@
+"""Division throughput: feed messages ingested per second as sections are added.
+
+Starts a Division of 1, 2, 4, ... section workers (up to the CPU count) on the simulated
+feed at a rate no single worker keeps up with, and reports the messages per second all
+workers ingested together, and the speed-up over one section.
+
+    python benchmarks/shards.py
+    python benchmarks/shards.py --seconds 20 --max-sections 8
+"""
+import argparse
+import os
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+os.environ["RAILWAY_FEED_LOG"] = ""   # no recording: it would only measure the disk
+
+from sharding import Division  # noqa: E402
+
+
+def throughput(sections, seconds, warmup, rate):
+    os.environ["RAILWAY_FEED"] = f"sim:{rate}"
+    division = Division([f"Section {n + 1}" for n in range(sections)]).start()
+    try:
+        time.sleep(warmup)
+        before = sum(shard.messages for shard in division.by_index)
+        time.sleep(seconds)
+        after = sum(shard.messages for shard in division.by_index)
+    finally:
+        division.stop()
+    return (after - before) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--rate", type=int, default=500_000, help="simulated messages per second offered to each section")
+    parser.add_argument("--max-sections", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    counts = [1]
+    while counts[-1] * 2 <= args.max_sections:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != args.max_sections:
+        counts.append(args.max_sections)
+
+    print(f"{'sections':>8} {'msgs/s':>12} {'speed-up':>9}")
+    single = None
+    for sections in counts:
+        rate = throughput(sections, args.seconds, args.warmup, args.rate)
+        single = single or rate
+        print(f"{sections:8d} {rate:12,.0f} {rate / single:8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
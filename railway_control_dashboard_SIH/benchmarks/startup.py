@@ -0,0 +1,137 @@
+"""Cold-start benchmark: process start to first paint for every page script.
+
+Each sample starts a fresh interpreter that imports streamlit's AppTest and runs the
+script once (what a new session waits for before anything is drawn), then reruns it a
+few times for the per-rerun overhead. It also reports which heavy libraries the page
+pulled in. Results are compared with startup_baseline.json like run_benchmarks.py.
+
+    python benchmarks/startup.py                   # compare with startup_baseline.json
+    python benchmarks/startup.py --save-baseline   # record a new baseline
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(BENCH_DIR, "startup_baseline.json")
+HEAVY = ("numpy", "pandas", "plotly")
+TIMEOUT = 120
+sys.path.insert(0, APP_DIR)
+
+from sweep import percentile  # noqa: E402
+
+# name -> (script, app.py navigation page to open after the first run, or None)
+SCENARIOS = {
+    "app.py": ("app.py", None),
+    "app.py Performance & Audit": ("app.py", "Performance & Audit"),
+    "1_Live_Operations.py": ("1_Live_Operations.py", None),
+    "2_Simulation_Studio.py": ("pages/2_Simulation_Studio.py", None),
+    "3_Performance_Audit.py": ("pages/3_Performance_Audit.py", None),
+}
+
+
+# --- CHILD PROCESS ---
+def child(script, page, reruns):
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(APP_DIR, script), default_timeout=TIMEOUT)
+    at.run()
+    first_paint = time.perf_counter() - started
+    if page is not None:
+        at.sidebar.radio[0].set_value(page).run()
+    if at.exception:
+        raise RuntimeError(f"{script}: {at.exception[0].message}")
+    timings = []
+    for _ in range(reruns):
+        rerun_started = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - rerun_started)
+    json.dump({
+        "first_paint_ms": first_paint * 1000.0,
+        "rerun_ms": percentile(timings, 50) * 1000.0,
+        "heavy": [name for name in HEAVY if name in sys.modules],
+    }, sys.stdout)
+
+
+# --- PARENT ---
+def measure(script, page, samples, reruns, env):
+    runs = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        command = [sys.executable, os.path.abspath(__file__), "--child", script, "--reruns", str(reruns)]
+        if page is not None:
+            command += ["--page", page]
+        out = subprocess.run(command, env=env, cwd=APP_DIR, capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        result["process_ms"] = (time.perf_counter() - started) * 1000.0
+        runs.append(result)
+    return {
+        "process_ms": percentile([run["process_ms"] for run in runs], 50),
+        "first_paint_ms": percentile([run["first_paint_ms"] for run in runs], 50),
+        "rerun_ms": percentile([run["rerun_ms"] for run in runs], 50),
+        "heavy": runs[-1]["heavy"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=5, help="fresh processes per scenario")
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown over baseline")
+    parser.add_argument("--only", help="run scenarios whose name contains this text")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--page", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.page, args.reruns)
+        return 0
+
+    scratch = tempfile.mkdtemp(prefix="startup-bench-")
+    env = dict(
+        os.environ,
+        RAILWAY_AUDIT_DB=os.path.join(scratch, "audit.db"),
+        RAILWAY_SCENARIO_CACHE=os.path.join(scratch, "scenario_cache"),
+        RAILWAY_METRICS_PORT="0",
+        RAILWAY_FEED_LOG="",   # no recording, as in run_benchmarks.py
+    )
+    results = {}
+    print(f"{'scenario':30} {'process':>9} {'1st paint':>9} {'rerun':>8}  heavy imports")
+    for name, (script, page) in SCENARIOS.items():
+        if args.only and args.only not in name:
+            continue
+        results[name] = result = measure(script, page, args.samples, args.reruns, env)
+        print(f"{name:30} {result['process_ms']:9.0f} {result['first_paint_ms']:9.0f} {result['rerun_ms']:8.1f}  "
+              f"{', '.join(result['heavy']) or '-'}")
+
+    if args.save_baseline:
+        with open(BASELINE, "w") as handle:
+            json.dump(results, handle, indent=2, sort_keys=True)
+        print(f"Baseline saved to {BASELINE}")
+        return 0
+    if not os.path.exists(BASELINE):
+        print("No startup_baseline.json yet; run with --save-baseline to record one.")
+        return 0
+    with open(BASELINE) as handle:
+        baseline = json.load(handle)
+    found = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric in ("process_ms", "first_paint_ms", "rerun_ms"):
+            if result[metric] > reference[metric] * (1.0 + args.tolerance):
+                found.append(f"{name}: {metric} {result[metric]:.1f} vs baseline {reference[metric]:.1f}")
+    for line in found:
+        print(f"REGRESSION {line}")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Working timetable import: load time and peak memory at division scale.
+
+Writes a CSV working timetable of --trains trains (one row per timing point) and reports
+the first load (parse and compile), a later load (memory-mapped image) and, when pandas is
+installed, a plain pd.read_csv of the same file for comparison. Each load runs twice:
+once timed, once under tracemalloc for the peak memory allocated (tracing slows it down).
+
+    python benchmarks/timetable_load.py
+    python benchmarks/timetable_load.py --trains 100000
+"""
+import argparse
+import csv
+import os
+import random
+import shutil
+import sys
+import time
+import tracemalloc
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCH_DIR, ".fixtures")
+sys.path.insert(0, APP_DIR)
+
+from network import NODES, TYPE_NAMES  # noqa: E402
+from timetable import TYPE_MIX, booked_times  # noqa: E402
+from timetable_loader import COLUMNS, load_timetable_file  # noqa: E402
+
+
+def write_timetable_csv(path, trains, seed=0):
+    rng = random.Random(seed)
+    types = [TYPE_NAMES.index(name) for name in TYPE_MIX]
+
+    def clock(minutes):
+        minutes = round(minutes)
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+    with open(path, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(COLUMNS)
+        for n in range(trains):
+            type_code = rng.choices(types, weights=list(TYPE_MIX.values()))[0]
+            direction = rng.randint(0, 1)
+            arr, dep = booked_times(type_code, direction, rng.randrange(0, 24 * 60 - 90))
+            nodes = range(len(NODES)) if direction == 0 else range(len(NODES) - 1, -1, -1)
+            for k, node in enumerate(nodes):
+                writer.writerow((
+                    f"T{n:06d}", TYPE_NAMES[type_code], NODES[node]["label"],
+                    clock(arr[k]) if k else "", clock(dep[k]) if k < len(NODES) - 1 else "",
+                ))
+
+
+def measure(load, before=lambda: None):
+    before()
+    started = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - started
+    before()
+    tracemalloc.start()
+    load()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trains", type=int, default=50_000)
+    args = parser.parse_args()
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    path = os.path.join(FIXTURE_DIR, f"timetable-{args.trains}.csv")
+    cache_dir = os.path.join(FIXTURE_DIR, "timetable_cache")
+    if not os.path.exists(path):
+        write_timetable_csv(path, args.trains)
+    print(f"{args.trains:,} trains, {os.path.getsize(path) / 2**20:.1f} MiB CSV")
+
+    print(f"{'load':<22} {'seconds':>8} {'peak MiB':>9}")
+    for name, before in (
+        ("first (compile)", lambda: shutil.rmtree(cache_dir, ignore_errors=True)),
+        ("later (mapped)", lambda: None),
+    ):
+        elapsed, peak = measure(lambda: load_timetable_file(path, cache_dir), before)
+        print(f"{name:<22} {elapsed:8.2f} {peak / 2**20:9.1f}")
+    try:
+        import pandas as pd
+    except ImportError:
+        print("pandas not installed, skipping pd.read_csv")
+    else:
+        elapsed, peak = measure(lambda: pd.read_csv(path))
+        print(f"{'pd.read_csv':<22} {elapsed:8.2f} {peak / 2**20:9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import threading
+
+import numpy as np
+
+from network import BLOCKS, HEADWAY, N_BLOCKS, N_NODES, UP, UTILIZATION_LIMIT, path_block
+
+# --- CAPACITY (UIC 406) ---
+# Utilization of each block line per time window by the compression method of UIC Code
+# 406: the trains entering a line within a window are pushed together, keeping their
+# order and running times, until each follows the one in front at the minimum headway the
+# signalling allows. The compressed occupation time over the window length is the
+# capacity utilization. Under the simulator's rules a train may enter a line HEADWAY after
+# the one in front and may not reach the far end less than HEADWAY behind it, so train j
+# behind train i needs max(HEADWAY, run_i - run_j + HEADWAY), and the last train of a
+# window holds the line for HEADWAY.
+WINDOW = 60.0            # minutes per capacity window
+N_LINES = N_BLOCKS * 2   # line = block * 2 + direction, as in the simulator
+LINE_NAMES = [f"{block} {'UP' if d == UP else 'DOWN'}" for block in BLOCKS for d in (0, 1)]
+LINE_OF = np.array([[path_block(d, k) * 2 + d for k in range(N_BLOCKS)] for d in (0, 1)])   # [direction, path position]
+
+
+class CapacityReport:
+    """Per line and window: trains entering, compressed occupation (minutes) and utilization (%).
+
+    Arrays are (N_LINES, n_windows); window w covers [w * WINDOW, (w + 1) * WINDOW).
+    """
+    __slots__ = ("trains", "occupation", "utilization")
+
+    def __init__(self, trains, occupation):
+        self.trains = trains.reshape(N_LINES, -1)
+        self.occupation = occupation.reshape(N_LINES, -1)
+        self.utilization = 100.0 * self.occupation / WINDOW
+
+    @property
+    def trains_per_hour(self):
+        return self.trains * (60.0 / WINDOW)
+
+    def window(self, minutes):
+        return min(max(int(minutes // WINDOW), 0), self.utilization.shape[1] - 1)
+
+    def now(self, minutes):
+        """(line, line name, utilization %) of the busiest line in the window containing `minutes`."""
+        w = self.window(minutes)
+        line = int(self.utilization[:, w].argmax())
+        return line, LINE_NAMES[line], float(self.utilization[line, w])
+
+    def at(self, line, minutes):
+        return float(self.utilization[line, self.window(minutes)])
+
+    def peak(self):
+        """(line name, window start in minutes, utilization %) of the busiest line and window."""
+        line, w = np.unravel_index(self.utilization.argmax(), self.utilization.shape)
+        return LINE_NAMES[line], float(w * WINDOW), float(self.utilization[line, w])
+
+    def by_line(self):
+        """[(line name, peak trains/h, peak utilization %, windows over UTILIZATION_LIMIT), ...]"""
+        return [
+            (name, float(self.trains_per_hour[line].max()), float(self.utilization[line].max()),
+             int((self.utilization[line] > UTILIZATION_LIMIT).sum()))
+            for line, name in enumerate(LINE_NAMES)
+        ]
+
+
+def _windows(entry):
+    windows = entry // WINDOW
+    return np.where(np.isnan(windows), -1, np.maximum(windows, 0)).astype(np.intp)   # -1: no time
+
+
+def _occupation(keys, entry, run, size):
+    """Trains and compressed occupation per cell (line * n_windows + window) for the
+    entries with keys >= 0."""
+    valid = keys >= 0
+    keys, entry, run = keys[valid], entry[valid], run[valid]
+    order = np.lexsort((entry, keys))
+    keys, run = keys[order], run[order]
+    same = keys[1:] == keys[:-1]
+    headway = np.maximum(HEADWAY, run[:-1] - run[1:] + HEADWAY)
+    trains = np.bincount(keys, minlength=size)
+    occupation = np.bincount(keys[1:][same], weights=headway[same], minlength=size) + HEADWAY * (trains > 0)
+    return trains, occupation
+
+
+# --- ENGINE ---
+# Holds every train's entry and running time per block of its path, flattened to
+# (n_trains * N_BLOCKS,), and the per-cell totals they give. update()/evaluate() take new
+# times for all trains but only re-compress the cells a changed train leaves or enters,
+# so a single-train change touches a few windows instead of the whole day.
+class CapacityEngine:
+    def __init__(self, timetable, arr=None, dep=None):
+        self.booked_arr = np.asarray(timetable.sched_arr, dtype=np.float64).reshape(-1, N_NODES)
+        self.booked_dep = np.asarray(timetable.sched_dep, dtype=np.float64).reshape(-1, N_NODES)
+        self.dirs = np.asarray(timetable.dirs, dtype=np.intp)
+        self.lock = threading.Lock()
+        self.entry, self.run = self._paths(self.booked_arr if arr is None else arr, self.booked_dep if dep is None else dep)
+        self.lines = LINE_OF[self.dirs].ravel()
+        self.n_windows = max(int(24 * 60 // WINDOW), int(np.nanmax(self.entry, initial=0.0) // WINDOW) + 1)
+        self.keys = self._keys(self.lines, self.entry, self.n_windows)
+        self.trains, self.occupation = _occupation(self.keys, self.entry, self.run, N_LINES * self.n_windows)
+        self.report = self.reference = CapacityReport(self.trains, self.occupation)   # reference: as built
+
+    def _paths(self, arr, dep):
+        """Entry times and running times per (train, path position), NaN times falling back to booked."""
+        n = len(self.booked_arr)
+        arr = np.array(arr, dtype=np.float64).reshape(-1, N_NODES)
+        dep = np.array(dep, dtype=np.float64).reshape(-1, N_NODES)
+        arr[:n] = np.where(np.isnan(arr[:n]), self.booked_arr, arr[:n])
+        dep[:n] = np.where(np.isnan(dep[:n]), self.booked_dep, dep[:n])
+        return dep[:, :-1].ravel(), (arr[:, 1:] - dep[:, :-1]).ravel()
+
+    @staticmethod
+    def _keys(lines, entry, n_windows):
+        windows = _windows(entry)
+        return np.where(windows >= 0, lines * n_windows + np.minimum(windows, n_windows - 1), -1)
+
+    def evaluate(self, arr, dep, dirs=None):
+        """Report for other times of the same trains, plus any appended after them (with
+        `dirs` covering all of them), leaving the engine's own state as it was."""
+        return self._apply(arr, dep, dirs)[-1]
+
+    def update(self, arr, dep):
+        """Adopt new times, e.g. predicted ones, and return their report. NaN keeps the booked time."""
+        with self.lock:
+            self.entry, self.run, self.keys, self.n_windows, self.trains, self.occupation, self.report = self._apply(arr, dep, None)
+            return self.report
+
+    def _apply(self, arr, dep, dirs):
+        entry, run = self._paths(arr, dep)
+        m = len(self.entry)
+        lines = self.lines if dirs is None else LINE_OF[np.asarray(dirs, dtype=np.intp)].ravel()
+        if int(np.nanmax(entry, initial=0.0) // WINDOW) >= self.n_windows:
+            # Later than any window so far: start over with enough windows.
+            n_windows = int(np.nanmax(entry) // WINDOW) + 1
+            keys = self._keys(lines, entry, n_windows)
+            trains, occupation = _occupation(keys, entry, run, N_LINES * n_windows)
+            return entry, run, keys, n_windows, trains, occupation, CapacityReport(trains, occupation)
+
+        keys = self._keys(lines, entry, self.n_windows)
+        changed = np.ones(len(entry), dtype=bool)
+        changed[:m] = (keys[:m] != self.keys) | ~np.isclose(entry[:m], self.entry, equal_nan=True) | ~np.isclose(run[:m], self.run, equal_nan=True)
+        touched = np.union1d(keys[changed], self.keys[changed[:m]])
+        touched = touched[touched >= 0]
+        trains, occupation = self.trains.copy(), self.occupation.copy()
+        if len(touched):
+            subset = np.isin(keys, touched)
+            sub_trains, sub_occupation = _occupation(np.where(subset, keys, -1), entry, run, len(trains))
+            trains[touched], occupation[touched] = sub_trains[touched], sub_occupation[touched]
+        return entry, run, keys, self.n_windows, trains, occupation, CapacityReport(trains, occupation)
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+
+from audit_store import CONTROLLER
+from instrumentation import observe, register
+
+# --- COMMAND DISPATCH ---
+# Controller commands (manual overrides, accepted and rejected recommendations) are
+# validated on the click, then handed to an asyncio loop on a background thread that
+# sends them to the downstream sink and waits for its acknowledgement. submit() only
+# takes a lock and schedules the send, so a click returns at once however slow the sink.
+#
+# Backpressure: at most QUEUE_LIMIT commands may be waiting or unacknowledged; beyond
+# that submit() refuses new ones rather than let them pile up behind a stalled sink.
+# Idempotency: a command's key is what it does (section, action, train, detail). The same
+# key again within DEDUP_WINDOW, e.g. a double click or two controllers accepting one
+# recommendation, is not sent twice; a command that failed is forgotten at once, so it can
+# be retried straight away. Each click also gets its own id, kept across resends,
+# and the sink acknowledges an id it has already applied without applying it again, so a
+# resend after an ack timeout is harmless while the same order given again later is not
+# mistaken for it.
+QUEUE_LIMIT = int(os.environ.get("RAILWAY_COMMAND_QUEUE", "64"))
+SINK_LATENCY = float(os.environ.get("RAILWAY_SINK_LATENCY", "0.25"))   # mean seconds to ack, stand-in sink
+DISPATCH_WORKERS = 4   # commands in flight to the sink at once
+ACK_TIMEOUT = 5.0      # seconds to wait for an acknowledgement before resending
+SEND_ATTEMPTS = 3
+DEDUP_WINDOW = 30.0    # seconds a key is remembered after its command finishes
+HISTORY = 20           # latest commands kept for the Live page
+
+MANUAL_ACTIONS = ["Proceed Via Main Line", "Hold at Next Station", "Route to Siding"]
+ACCEPT = "Accept Recommendation"
+REJECT = "Reject Recommendation"
+ACTIONS = MANUAL_ACTIONS + [ACCEPT, REJECT]
+TRAIN_ID = re.compile(r"[0-9A-Za-z][0-9A-Za-z/-]{0,15}")
+
+# Command status, and what submit() returns.
+QUEUED = "queued"
+SENT = "sent"
+ACKNOWLEDGED = "acknowledged"
+FAILED = "failed"
+DUPLICATE = "duplicate"
+REFUSED = "refused"
+NOT_SENT = {
+    DUPLICATE: "The same command was sent moments ago; not sent again.",
+    REFUSED: "The command queue is full; not sent. Try again shortly.",
+}
+
+
+@dataclass
+class Command:
+    key: str              # what the command does, for the dispatcher's dedup
+    id: str               # this click, for the sink's idempotency
+    action: str
+    train: str
+    detail: str
+    user: str
+    section: str
+    issued: float          # wall time of the click
+    clock: float           # perf_counter() at the click, for the ack latency
+    status: str = QUEUED
+    attempts: int = 0
+    latency: float = None  # seconds from click to acknowledgement (or to giving up)
+    error: str = None      # what the sink raised, if it failed rather than timed out
+
+    def describe(self):
+        return f"'{self.action}' for Train {self.train}" + (f" ({self.detail})" if self.detail else "")
+
+
+def make_command(action, train, detail="", user=CONTROLLER, section=None, known=None):
+    """A validated Command; ValueError with a message for the controller otherwise.
+    `known`, if given, are the train ids in the section."""
+    train = train.strip()
+    if not train:
+        raise ValueError("Enter a Train ID to send a command.")
+    if not TRAIN_ID.fullmatch(train):
+        raise ValueError(f"'{train}' is not a Train ID.")
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown command '{action}'.")
+    if known is not None and train not in known:
+        raise ValueError(f"Train {train} is not in the section.")
+    key = hashlib.sha1(f"{section}|{action}|{train}|{detail}".encode()).hexdigest()[:16]
+    return Command(key, uuid.uuid4().hex, action, train, detail, user, section, time.time(), time.perf_counter())
+
+
+def outcome_details(command):
+    """Audit trail line for a finished command."""
+    if command.status == ACKNOWLEDGED:
+        return f"Acknowledged {command.describe()} in {command.latency * 1000:.0f} ms."
+    if command.error:
+        return f"Sending {command.describe()} failed: {command.error}."
+    return f"No acknowledgement for {command.describe()} after {command.attempts} attempts."
+
+
+# --- DISPATCHER ---
+class CommandDispatcher:
+    def __init__(self, sink, on_done=None, limit=QUEUE_LIMIT, workers=DISPATCH_WORKERS):
+        self.sink = sink
+        self.on_done = on_done      # called with each acknowledged or failed Command, on the dispatch loop
+        self.limit = limit
+        self.workers = workers
+        self.commands = {}          # key -> Command, unfinished or finished within DEDUP_WINDOW
+        self.history = deque(maxlen=HISTORY)
+        self.waiting = 0
+        self.counts = {ACKNOWLEDGED: 0, FAILED: 0, DUPLICATE: 0, REFUSED: 0}
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.loop = self.queue = None
+        self.thread = None
+        register(self)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=asyncio.run, args=(self._main(),), name="command-dispatch", daemon=True)
+            self.thread.start()
+            self.ready.wait()
+        return self
+
+    def submit(self, command):
+        """Queue a command for the sink; returns QUEUED, DUPLICATE or REFUSED without waiting."""
+        with self.lock:
+            for key, earlier in list(self.commands.items()):
+                if earlier.latency is not None and command.issued - earlier.issued - earlier.latency > DEDUP_WINDOW:
+                    del self.commands[key]
+            if command.key in self.commands:
+                self.counts[DUPLICATE] += 1
+                return DUPLICATE
+            if self.waiting >= self.limit:
+                self.counts[REFUSED] += 1
+                return REFUSED
+            self.commands[command.key] = command
+            self.history.append(command)
+            self.waiting += 1
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, command)
+        return QUEUED
+
+    def recent(self, n=5):
+        """Latest commands, newest first."""
+        with self.lock:
+            return list(self.history)[::-1][:n]
+
+    async def _main(self):
+        self.loop, self.queue = asyncio.get_running_loop(), asyncio.Queue()
+        self.ready.set()
+        await asyncio.gather(*(self._send_loop() for _ in range(self.workers)))
+
+    async def _send_loop(self):
+        while True:
+            command = await self.queue.get()
+            try:
+                await self._send(command)
+            except Exception as error:   # a faulty sink fails the command, not the worker
+                command.error = repr(error)
+            finally:
+                if command.status != ACKNOWLEDGED:
+                    command.status = FAILED
+                command.latency = time.perf_counter() - command.clock
+                with self.lock:
+                    self.waiting -= 1
+                    self.counts[command.status] += 1
+                    if command.status == FAILED and self.commands.get(command.key) is command:
+                        del self.commands[command.key]   # a retry of a failed command is not a duplicate
+            if command.status == ACKNOWLEDGED:
+                observe("railway_command_ack_seconds", command.latency, action=command.action)
+            if self.on_done is not None:
+                try:
+                    self.on_done(command)
+                except Exception:
+                    pass   # e.g. the audit trail could not be written; the command itself is settled
+
+    async def _send(self, command):
+        command.status = SENT
+        for attempt in range(1, SEND_ATTEMPTS + 1):
+            command.attempts = attempt
+            try:
+                await asyncio.wait_for(self.sink.send(command), ACK_TIMEOUT)
+            except (asyncio.TimeoutError, OSError):
+                continue   # resend: the id keeps it from being applied twice
+            command.status = ACKNOWLEDGED
+            return
+
+    def metrics(self):
+        return [("railway_commands_waiting", "gauge", {}, self.waiting)] + [
+            ("railway_commands_total", "counter", {"outcome": outcome}, count) for outcome, count in self.counts.items()
+        ]
+
+
+# --- STAND-IN SINK ---
+# Takes the place of the signalling / crew communication interface until one is
+# connected: acknowledges each command after a random delay averaging SINK_LATENCY.
+class LocalSink:
+    def __init__(self, latency=SINK_LATENCY, seed=None):
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.applied = {}   # command id -> wall time the command was applied
+
+    async def send(self, command):
+        await asyncio.sleep(self.rng.expovariate(1.0 / self.latency) if self.latency > 0 else 0.0)
+        self.applied.setdefault(command.id, time.time())   # a resend is acknowledged, not applied again
+        return self.applied[command.id]
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+from instrumentation import register
+
+MAX_ENTRIES = 512
+DEFAULT_TTL = 60.0   # seconds
+
+
+class _Pending:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+# --- SHARED COMPUTE CACHE ---
+# One instance serves every session. Keys carry whatever the value depends on (the feed
+# snapshot version, widget inputs, ...), so a new snapshot simply means new keys and old
+# entries age out through TTL and LRU eviction. When several sessions ask for the same
+# missing key at once, one computes it and the others wait for that result.
+class ComputeCache:
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()   # key -> (expires, value)
+        self.inflight = {}             # key -> _Pending
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0                 # requests served by another session's computation
+        self.evictions = 0
+        register(self)
+
+    def get(self, key, compute, ttl=None):
+        """Cached value for `key`, calling `compute()` at most once across sessions on a miss."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            pending = self.inflight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self.inflight[key] = _Pending()
+                self.misses += 1
+            else:
+                self.waits += 1
+
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = compute()
+        except BaseException as error:
+            pending.error = error
+            raise
+        else:
+            with self.lock:
+                self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), pending.value)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+            return pending.value
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            pending.done.set()
+
+    def invalidate(self, prefix):
+        """Drop every entry whose key starts with `prefix` (a tuple)."""
+        with self.lock:
+            for key in [key for key in self.entries if key[:len(prefix)] == prefix]:
+                del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses + self.waits
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "waits": self.waits,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.waits) / requests if requests else 0.0,
+            }
+
+    def metrics(self):
+        stats = self.stats()
+        return [
+            ("railway_compute_cache_requests_total", "counter", {"result": result}, stats[field])
+            for result, field in (("hit", "hits"), ("miss", "misses"), ("wait", "waits"))
+        ] + [
+            ("railway_compute_cache_evictions_total", "counter", {}, stats["evictions"]),
+            ("railway_compute_cache_entries", "gauge", {}, stats["entries"]),
+        ]
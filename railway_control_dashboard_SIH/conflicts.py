@@ -0,0 +1,115 @@
+import math
+import threading
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+
+from network import (
+    BLOCKS, DWELL, HEADWAY, N_BLOCKS, N_NODES, path_block, path_nodes, run_minutes, stops_at,
+)
+
+CONFLICT_LOOKAHEAD = 120  # minutes ahead the dashboard looks for conflicts
+
+
+@dataclass(frozen=True)
+class Conflict:
+    line: int        # block * 2 + direction
+    ahead: str       # train planned to enter the line first
+    behind: str      # train that would run inside the headway of `ahead`
+    time: float      # planned entry of `behind` into the block (minutes after midnight)
+    severity: float  # minutes `behind` would lose to restore the headway
+
+    @property
+    def block(self):
+        return BLOCKS[self.line // 2]
+
+
+def planned_occupancies(timetable, i, delay=0.0):
+    """Free-running plan of train row `i` carrying `delay`.
+
+    Returns [(line, entry, exit, due), ...] where `due` is the booked arrival at the end
+    of the block, so running slowed behind another train is only a conflict past it.
+    """
+    d = timetable.dirs[i]
+    base = i * N_NODES
+    nodes = path_nodes(d)
+    plan = []
+    ready = timetable.sched_dep[base] + delay
+    for k in range(N_BLOCKS):
+        block = path_block(d, k)
+        entry = max(ready, timetable.sched_dep[base + k])
+        exit_ = entry + run_minutes(timetable.types[i], block)
+        plan.append((block * 2 + d, entry, exit_, timetable.sched_arr[base + k + 1]))
+        node = nodes[k + 1]
+        ready = exit_ + DWELL if stops_at(timetable.types[i], node) else exit_
+    return plan
+
+
+# --- INTERVAL-INDEXED CONFLICT DETECTOR ---
+# Planned occupancies are kept per block line in arrays sorted by entry time. Two trains
+# on a line clash when the follower would enter or leave less than HEADWAY after the
+# leader. Since no occupancy is longer than the longest one seen on the line, the only
+# candidates for a clash with [entry, exit) are the ones entering within
+# (entry - longest - HEADWAY, exit + HEADWAY), found with two bisections. Changing one
+# train's plan therefore only re-checks its own neighbourhood on each line.
+class ConflictDetector:
+    def __init__(self):
+        self.lines = [[] for _ in range(N_BLOCKS * 2)]       # (entry, train, exit, due), sorted
+        self.longest = [0.0] * (N_BLOCKS * 2)
+        self.plans = {}         # train -> [(line, entry, exit, due), ...]
+        self.delays = {}        # train -> delay its plan was built with
+        self.conflicts = {}     # (line, ahead, behind) -> Conflict
+        self.by_train = {}      # train -> set of conflict keys
+        self.lock = threading.Lock()
+
+    def update_train(self, train, plan):
+        """Replace a train's planned occupancies and re-check only the affected intervals."""
+        for line, *occupancy in self.plans.pop(train, ()):
+            items = self.lines[line]
+            del items[bisect_left(items, (occupancy[0], train, *occupancy[1:]))]
+        for key in self.by_train.pop(train, ()):
+            self.conflicts.pop(key, None)
+            other = key[2] if key[1] == train else key[1]
+            self.by_train.get(other, set()).discard(key)
+
+        for line, entry, exit_, due in plan:
+            items = self.lines[line]
+            mine = (entry, train, exit_, due)
+            self.longest[line] = max(self.longest[line], exit_ - entry)
+            lo = bisect_right(items, (entry - self.longest[line] - HEADWAY, "", math.inf))
+            hi = bisect_left(items, (exit_ + HEADWAY, "", -math.inf))
+            for other in items[lo:hi]:
+                if other[:2] <= mine[:2]:
+                    self._check(line, other, mine)
+                else:
+                    self._check(line, mine, other)
+            insort(items, mine)
+        self.plans[train] = list(plan)
+
+    def _check(self, line, ahead, behind):
+        # Too close on entry, or catching up so the follower's booked arrival is missed.
+        severity = max(HEADWAY - (behind[0] - ahead[0]), ahead[2] + HEADWAY - max(behind[2], behind[3]))
+        if severity <= 1e-9:
+            return
+        key = (line, ahead[1], behind[1])
+        self.conflicts[key] = Conflict(line, ahead[1], behind[1], behind[0], severity)
+        self.by_train.setdefault(ahead[1], set()).add(key)
+        self.by_train.setdefault(behind[1], set()).add(key)
+
+    def sync(self, timetable, delays):
+        """Bring plans in line with current delays ({train id: minutes}); returns trains re-planned."""
+        changed = []
+        with self.lock:
+            for i, train in enumerate(timetable.ids):
+                delay = delays.get(train, 0.0)
+                if self.delays.get(train) != delay:
+                    self.delays[train] = delay
+                    self.update_train(train, planned_occupancies(timetable, i, delay))
+                    changed.append(train)
+        return changed
+
+    def upcoming(self, now, horizon):
+        """Conflicts whose clash happens in [now, now + horizon), earliest first."""
+        with self.lock:
+            found = [c for c in self.conflicts.values() if now <= c.time < now + horizon]
+        return sorted(found, key=lambda c: (c.time, c.line))
+
@@ -0,0 +1,129 @@
+import threading
+
+import numpy as np
+
+from network import HEADWAY, N_BLOCKS, N_NODES, TYPE_NAMES, UP, path_block, run_minutes
+
+# Technical run time (no recovery allowance) by [type, direction, path position].
+RUN = np.array([
+    [[run_minutes(t, path_block(d, k)) for k in range(N_BLOCKS)] for d in (0, 1)]
+    for t in range(len(TYPE_NAMES))
+])
+POSITIONS = np.arange(N_NODES)
+
+
+class Prediction:
+    """Predicted times of every timetabled train, laid out like Timetable.sched_arr.
+
+    arr/dep are (n_trains, N_NODES) arrays in running order, NaN at nodes a train has
+    already passed or for trains not running; delay is arr minus the booked arrival.
+    """
+    __slots__ = ("version", "arr", "dep", "delay", "index")
+
+    def __init__(self, version, arr, dep, delay, index):
+        self.version = version
+        self.arr = arr
+        self.dep = dep
+        self.delay = delay
+        self.index = index
+
+    def exit_delays(self, snapshot):
+        """Predicted delay at the end of the section for each train in `snapshot`.
+
+        Trains the timetable does not know keep the delay they last reported.
+        """
+        delays = []
+        for train, reported in zip(snapshot.ids, snapshot.delay):
+            i = self.index.get(train)
+            predicted = self.delay[i, -1] if i is not None else np.nan
+            delays.append(float(reported) if np.isnan(predicted) else float(predicted))
+        return delays
+
+
+# --- DELAY PROPAGATION ---
+# From the delay each train reports approaching its next node, runs every train on to the
+# end of the section at once, one path position per step. At each node a train leaves
+# after its booked dwell but never before its booked departure; it then enters the next
+# block no sooner than HEADWAY behind the train ahead on that line, and runs at
+# technical speed, winning back the recovery allowance without arriving early. Each
+# direction has its own lines, so its trains are propagated together.
+#
+# Feed ticks are incremental: only the directions with a train whose position or delay
+# changed are re-propagated, and only from the first path position such a train
+# touches; earlier positions are reused from the previous update.
+class EtaPredictor:
+    def __init__(self, timetable):
+        n = len(timetable)
+        self.timetable = timetable
+        self.booked_arr = np.asarray(timetable.sched_arr, dtype=np.float64).reshape(n, N_NODES)   # int32 minutes if loaded from a file
+        self.booked_dep = np.asarray(timetable.sched_dep, dtype=np.float64).reshape(n, N_NODES)
+        self.dwell = self.booked_dep - self.booked_arr
+        self.dirs = np.asarray(timetable.dirs, dtype=np.intp)
+        self.run = RUN[np.asarray(timetable.types, dtype=np.intp), self.dirs]
+        self.start = np.full(n, N_NODES)     # path position propagation starts from; N_NODES = not running
+        self.reported = np.zeros(n)          # delay reported approaching that position
+        self.arr = np.full((n, N_NODES), np.nan)
+        self.dep = np.full((n, N_NODES), np.nan)
+        self.lock = threading.Lock()
+        self.prediction = None
+
+    def observed(self, snapshot, now):
+        """Start position and delay of every train row: the feed's view of the trains in
+        section, plus booked trains not yet departed, which start on time."""
+        start = np.where(self.booked_dep[:, 0] >= now, 0, N_NODES)
+        reported = np.zeros(len(start))
+        index = self.timetable.index
+        for train, direction, node, delay in zip(snapshot.ids, snapshot.dirs, snapshot.next_node, snapshot.delay):
+            i = index.get(train)
+            if i is not None and self.dirs[i] == direction:
+                start[i] = node if direction == UP else N_NODES - 1 - node
+                reported[i] = delay
+        return start, reported
+
+    def update(self, snapshot, now):
+        """Prediction for `snapshot` at `now` (minutes after midnight)."""
+        start, reported = self.observed(snapshot, now)
+        with self.lock:
+            changed = (start != self.start) | (reported != self.reported)
+            if self.prediction is not None and not changed.any():
+                return self.prediction
+            for direction in (0, 1):
+                moved = changed & (self.dirs == direction)
+                if moved.any():
+                    first = int(min(start[moved].min(), self.start[moved].min(), N_NODES - 1))
+                    self._propagate(np.flatnonzero(self.dirs == direction), first, start, reported)
+            self.start, self.reported = start, reported
+            arr, dep = self.arr.copy(), self.dep.copy()
+            self.prediction = Prediction(snapshot.version, arr, dep, arr - self.booked_arr, self.timetable.index)
+            return self.prediction
+
+    def _propagate(self, rows, first, start, reported):
+        booked_arr, booked_dep = self.booked_arr[rows], self.booked_dep[rows]
+        dwell, run = self.dwell[rows], self.run[rows]
+        start, reported = start[rows], reported[rows]
+        arr, dep = self.arr[rows], self.dep[rows]
+        arr[:, first + 1:] = np.nan
+        dep[:, first:] = np.nan
+
+        for k in range(first, N_NODES):
+            seeded = start == k
+            arr[seeded, k] = booked_arr[seeded, k] + reported[seeded]
+            live = np.flatnonzero(start <= k)
+            if k == N_NODES - 1:
+                dep[live, k] = arr[live, k]
+                break
+            ready = np.maximum(booked_dep[live, k], arr[live, k] + dwell[live, k])
+            # Headway on the line: t'_j = max(t_j, t'_{j-1} + H) over trains in entry
+            # order, i.e. j*H + running max of (t_m - m*H).
+            order = np.argsort(ready, kind="stable")
+            gaps = np.arange(len(order)) * HEADWAY
+            entry = np.empty_like(ready)
+            entry[order] = np.maximum.accumulate(ready[order] - gaps) + gaps
+            dep[live, k] = entry
+            arr[live, k + 1] = np.maximum(entry + run[live, k], booked_arr[live, k + 1])
+
+        behind = POSITIONS[None, :] < start[:, None]
+        arr[behind] = np.nan
+        dep[behind] = np.nan
+        self.arr[rows] = arr
+        self.dep[rows] = dep
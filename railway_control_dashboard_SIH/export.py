@@ -0,0 +1,164 @@
+import csv
+import datetime
+import importlib.util
+import io
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from instrumentation import observe
+from rollups import PERIODS
+
+# --- EXPORT ENDPOINT ---
+# Audit trail and KPI history downloads are streamed by a small HTTP server on a daemon
+# thread rather than built in the page: rows are read from the store a chunk at a time
+# and written out as they are encoded, so an export of any size runs in constant memory,
+# and it never occupies a script run, so other sessions keep rerunning meanwhile.
+#
+#     /export/audit.csv?user=Controller_A&event_type=Manual+Override&period=Last+7+Days
+#     /export/kpi.jsonl?period=Last+24+Hours
+#
+# The page links to EXPORT_URL, which must be reachable from the browser; set it when
+# the dashboard is served beyond localhost.
+EXPORT_HOST = os.environ.get("RAILWAY_EXPORT_HOST", "127.0.0.1")
+EXPORT_PORT = int(os.environ.get("RAILWAY_EXPORT_PORT", "9465"))
+EXPORT_URL = os.environ.get("RAILWAY_EXPORT_URL", f"http://{EXPORT_HOST}:{EXPORT_PORT}")
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+if importlib.util.find_spec("pyarrow") is not None:   # optional: Parquet only with pyarrow installed
+    FORMATS["parquet"] = "application/vnd.apache.parquet"
+
+AUDIT_COLUMNS = ("Timestamp", "User", "Event Type", "Details")
+KPI_COLUMNS = ("Time", "Arrivals", "Punctuality (%)", "Average Delay (min)")
+
+
+def export_url(kind, fmt, **filters):
+    """Download link for an export; filters left as None or "All" are not applied."""
+    query = {name: value for name, value in filters.items() if value not in (None, "All")}
+    return f"{EXPORT_URL}/export/{kind}.{fmt}" + (f"?{urlencode(query)}" if query else "")
+
+
+def audit_chunks(store, user=None, event_type=None, period=None, now=None):
+    since = None if period is None else (time.time() if now is None else now) - PERIODS[period][1]
+    for rows in store.scan(user=user, event_type=event_type, since=since):
+        yield [(datetime.datetime.fromtimestamp(ts), user, event_type, details) for _, ts, user, event_type, details in rows]
+
+
+def kpi_chunks(rollups, period, now=None):
+    tier, span = PERIODS[period]
+    for rows in rollups.scan(tier, (time.time() if now is None else now) - span):
+        yield [(datetime.datetime.fromtimestamp(bucket), *values) for bucket, *values in rows]
+
+
+# --- ENCODERS ---
+# Each turns chunks of rows into chunks of bytes; the first row of a text export is the header.
+def encode_csv(chunks, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def encode_jsonl(chunks, columns):
+    for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=datetime.datetime.isoformat) + "\n" for row in rows
+        ).encode()
+
+
+class _Pending(io.RawIOBase):
+    """Write-only sink the Parquet writer fills and the encoder drains after each row group."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(self.parts[-1])
+        return len(self.parts[-1])
+
+    def drain(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def encode_parquet(chunks, columns):
+    import pyarrow   # imported with the first Parquet export
+    import pyarrow.parquet
+
+    sink = _Pending()
+    writer = None
+    for rows in chunks:
+        table = pyarrow.table({name: list(values) for name, values in zip(columns, zip(*rows))})
+        if writer is None:
+            writer = pyarrow.parquet.ParquetWriter(sink, table.schema)
+        writer.write_table(table)   # one row group per chunk
+        yield sink.drain()
+    if writer is None:   # nothing matched: still a valid file, with the columns
+        writer = pyarrow.parquet.ParquetWriter(sink, pyarrow.table({name: [] for name in columns}).schema)
+    writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {"csv": encode_csv, "jsonl": encode_jsonl, "parquet": encode_parquet}
+
+
+# --- SERVER ---
+def _handler(store, rollups):
+    class ExportHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            kind, _, fmt = url.path.removeprefix("/export/").partition(".")
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            period = query.get("period")
+            if kind not in ("audit", "kpi") or fmt not in FORMATS or (period is not None and period not in PERIODS):
+                self.send_error(404)
+                return
+            if kind == "audit":
+                chunks, columns = audit_chunks(store, query.get("user"), query.get("event_type"), period), AUDIT_COLUMNS
+            else:
+                chunks, columns = kpi_chunks(rollups, period or "Last 24 Hours"), KPI_COLUMNS
+            started = time.perf_counter()
+            self.send_response(200)
+            self.send_header("Content-Type", FORMATS[fmt])
+            self.send_header("Content-Disposition", f'attachment; filename="{kind}-{time.strftime("%Y%m%d-%H%M%S")}.{fmt}"')
+            self.end_headers()   # no Content-Length: the body ends when the connection closes
+            try:
+                for data in ENCODERS[fmt](chunks, columns):
+                    self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):   # download cancelled
+                pass
+            finally:
+                chunks.close()
+                observe("railway_export_seconds", time.perf_counter() - started, kind=kind, format=fmt)
+
+        def log_message(self, *args):
+            pass
+
+    return ExportHandler
+
+
+def start_export_server(store, rollups, host=EXPORT_HOST, port=EXPORT_PORT):
+    """Serve /export/ from a daemon thread; None if the port is taken (e.g. by another worker,
+    which serves the same database)."""
+    try:
+        server = ThreadingHTTPServer((host, port), _handler(store, rollups))
+    except OSError:
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="export", daemon=True).start()
+    return server
@@ -0,0 +1,477 @@
+import asyncio
+import datetime
+import os
+import random
+import threading
+import time
+from array import array
+
+from instrumentation import register
+from network import (
+    N_NODES, NODES, PUNCTUALITY_THRESHOLD, TYPE_CODES, TYPE_NAMES, fmt_clock, path_nodes, stops_at,
+)
+
+# --- FEED MESSAGES ---
+# One message per line: "timestamp,train_id,type,direction,km,node,delay,event"
+# timestamp: epoch seconds; km: distance from Station A; delay: minutes late (negative =
+# early); event: POS (position report), DEP, ARR or EXIT. `node` indexes NODES: the next
+# node ahead for POS, the node where it happened for DEP/ARR/EXIT.
+EVENTS = ["POS", "DEP", "ARR", "EXIT"]
+EVENT_CODES = {name: code for code, name in enumerate(EVENTS)}
+POS, DEP, ARR, EXIT = range(len(EVENTS))
+
+MAX_TRAINS = 2048         # slots in the train-state ring
+EVENT_CAPACITY = 4096     # node events kept for the Event Log
+PUBLISH_INTERVAL = 0.25   # seconds between snapshots
+UI_REFRESH = 2.0          # seconds between fragment reruns of the live widgets
+RECOMMENDATION_REFRESH = 15.0  # seconds between re-solves of the AI Recommendation
+LIVE_REFRESH = 10.0       # seconds between redraws of the live time-distance diagram
+STALE_AFTER = 10.0        # feed shown as stale when the newest message is older than this
+FEED_LOG = os.environ.get(   # directory of recorded days, for replay; set empty to not record
+    "RAILWAY_FEED_LOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "feed_log")
+)
+RECORD_INTERVAL = 15.0    # seconds between recorded position reports of one train
+PATHS = [path_nodes(0), path_nodes(1)]
+
+
+# --- SNAPSHOTS ---
+# Immutable view of the section published by the ingest thread. Readers just take the
+# reference held in FeedIngest.latest; nothing is copied per reader.
+class Snapshot:
+    __slots__ = ("version", "created", "ids", "types", "dirs", "km", "next_node", "delay", "updated", "events")
+
+    def __init__(self, version, created, ids, types, dirs, km, next_node, delay, updated, events):
+        self.version = version
+        self.created = created
+        self.ids = ids
+        self.types = types
+        self.dirs = dirs
+        self.km = km
+        self.next_node = next_node
+        self.delay = delay
+        self.updated = updated
+        self.events = events    # newest last: (timestamp, train, event, node)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def delays(self):
+        return {train: round(delay, 1) for train, delay in zip(self.ids, self.delay)}
+
+
+EMPTY_SNAPSHOT = Snapshot(0, 0.0, (), array("b"), array("b"), array("d"), array("b"), array("f"), array("d"), ())
+
+
+# --- RING BUFFERS ---
+class TrainStateRing:
+    """Latest state per train in fixed-size arrays; new trains reuse slots in ring order."""
+
+    def __init__(self, capacity=MAX_TRAINS):
+        self.capacity = capacity
+        self.slot_of = {}
+        self.ids = [None] * capacity
+        self.types = array("b", [0]) * capacity
+        self.dirs = array("b", [0]) * capacity
+        self.km = array("d", [0.0]) * capacity
+        self.next_node = array("b", [0]) * capacity
+        self.delay = array("f", [0.0]) * capacity
+        self.updated = array("d", [0.0]) * capacity
+        self.active = array("b", [0]) * capacity
+        self.cursor = 0
+
+    def slot(self, train):
+        slot = self.slot_of.get(train)
+        if slot is None:
+            # Take the next slot, preferring one whose train has left the section.
+            for _ in range(self.capacity):
+                slot = self.cursor
+                self.cursor = (self.cursor + 1) % self.capacity
+                if not self.active[slot]:
+                    break
+            self.slot_of.pop(self.ids[slot], None)
+            self.ids[slot] = train
+            self.slot_of[train] = slot
+        return slot
+
+    def snapshot_columns(self):
+        live = [slot for slot in range(self.capacity) if self.active[slot]]
+        return (
+            tuple(self.ids[s] for s in live),
+            array("b", (self.types[s] for s in live)),
+            array("b", (self.dirs[s] for s in live)),
+            array("d", (self.km[s] for s in live)),
+            array("b", (self.next_node[s] for s in live)),
+            array("f", (self.delay[s] for s in live)),
+            array("d", (self.updated[s] for s in live)),
+        )
+
+
+class EventRing:
+    """Last EVENT_CAPACITY node events (departures, arrivals, exits)."""
+
+    def __init__(self, capacity=EVENT_CAPACITY):
+        self.capacity = capacity
+        self.ts = array("d", [0.0]) * capacity
+        self.trains = [None] * capacity
+        self.events = array("b", [0]) * capacity
+        self.nodes = array("b", [0]) * capacity
+        self.head = 0
+        self.count = 0
+
+    def append(self, ts, train, event, node):
+        self.ts[self.head] = ts
+        self.trains[self.head] = train
+        self.events[self.head] = event
+        self.nodes[self.head] = node
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def tail(self, n):
+        n = min(n, self.count)
+        idx = [(self.head - n + k) % self.capacity for k in range(n)]
+        return tuple((self.ts[i], self.trains[i], self.events[i], self.nodes[i]) for i in idx)
+
+
+# --- INGEST ---
+class FeedIngest:
+    """Runs a message source on an asyncio loop in a background thread."""
+
+    def __init__(self, source, on_events=None, recorder=None):
+        self.source = source
+        self.on_events = on_events    # called with each batch's [(ts, train, event, node, delay), ...]
+        self.recorder = recorder
+        self.state = TrainStateRing()
+        self.events = EventRing()
+        self.latest = EMPTY_SNAPSHOT
+        self.messages = 0
+        self.errors = 0
+        self.last_message_ts = 0.0
+        self.dirty = False
+        self.thread = None
+        register(self)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=asyncio.run, args=(self._main(),), name="feed-ingest", daemon=True)
+            self.thread.start()
+        return self
+
+    @property
+    def lag(self):
+        """Seconds between now and the newest message timestamp seen."""
+        return time.time() - self.last_message_ts if self.last_message_ts else float("nan")
+
+    async def _main(self):
+        publisher = asyncio.create_task(self._publish_loop())
+        try:
+            await self.source.run(self.ingest)
+        finally:
+            publisher.cancel()
+
+    async def _publish_loop(self):
+        while True:
+            await asyncio.sleep(PUBLISH_INTERVAL)
+            if self.dirty:
+                self.publish()
+
+    def ingest(self, lines):
+        """Apply a batch of raw message lines (called on the ingest loop)."""
+        state = self.state
+        events = []
+        recorded = []
+        for line in lines:
+            try:
+                ts, train, type_name, direction, km, node, delay, event = line.split(",")
+                ts, direction, node, event = float(ts), int(direction), int(node), EVENT_CODES[event.strip()]
+                path = PATHS[direction]
+                slot = state.slot(train)
+                state.types[slot] = TYPE_CODES[type_name]
+                state.dirs[slot] = direction
+                state.km[slot] = float(km)
+                state.next_node[slot] = node if event == POS else path[min(path.index(node) + 1, N_NODES - 1)]
+                state.delay[slot] = float(delay)
+                state.updated[slot] = ts
+                state.active[slot] = event != EXIT
+            except (ValueError, KeyError, IndexError):
+                self.errors += 1
+                continue
+            if event != POS:
+                self.events.append(ts, train, event, node)
+                events.append((ts, train, event, node, state.delay[slot]))
+            if self.recorder is not None and self.recorder.keep(ts, train, event):
+                recorded.append(line)
+            self.last_message_ts = max(self.last_message_ts, ts)
+            self.messages += 1
+        self.dirty = True
+        if events and self.on_events is not None:
+            self.on_events(events)
+        if recorded:
+            self.recorder.write(recorded)
+
+    def publish(self):
+        self.dirty = False
+        self.latest = Snapshot(self.latest.version + 1, time.time(), *self.state.snapshot_columns(), self.events.tail(50))
+
+    def metrics(self):
+        return [
+            ("railway_feed_lag_seconds", "gauge", {}, self.lag),
+            ("railway_feed_messages_total", "counter", {}, self.messages),
+            ("railway_feed_errors_total", "counter", {}, self.errors),
+            ("railway_feed_snapshot_version", "gauge", {}, self.latest.version),
+        ]
+
+
+# --- RECORDING ---
+# The messages of each day go to FEED_LOG/<date>.csv (<date>-<name>.csv for a named
+# section) in the feed's own line format, for historical replay. Node events are all
+# kept; position reports only every RECORD_INTERVAL per train, which is plenty to place a
+# train on the map and keeps a day's log small at any feed rate.
+class FeedRecorder:
+    def __init__(self, name="", directory=FEED_LOG):
+        self.name = name
+        self.directory = directory
+        self.last_position = {}   # train -> ts of its last recorded position report
+        self.opens = self.closes = 0.0   # local day the open file covers
+        self.handle = None
+
+    def keep(self, ts, train, event):
+        if event != POS:
+            if event == EXIT:
+                self.last_position.pop(train, None)
+            return True
+        if ts - self.last_position.get(train, float("-inf")) < RECORD_INTERVAL:
+            return False
+        self.last_position[train] = ts
+        return True
+
+    def write(self, lines):
+        """Append lines to the log of the day of each line's own timestamp."""
+        start = 0
+        for k, line in enumerate(lines):
+            ts = float(line.split(",", 1)[0])
+            if not self.opens <= ts < self.closes:   # e.g. a batch that crosses midnight
+                self._append(lines[start:k])
+                self._open(ts)
+                start = k
+        self._append(lines[start:])
+        self.handle.flush()
+
+    def _open(self, ts):
+        if self.handle is not None:
+            self.handle.close()
+        midnight = datetime.datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.opens, self.closes = midnight.timestamp(), (midnight + datetime.timedelta(days=1)).timestamp()
+        day = midnight.strftime("%Y-%m-%d")
+        os.makedirs(self.directory, exist_ok=True)
+        filename = f"{day}-{self.name}.csv" if self.name else f"{day}.csv"
+        self.handle = open(os.path.join(self.directory, filename), "a", encoding="utf-8")
+
+    def _append(self, lines):
+        if lines:
+            self.handle.write("".join(line.rstrip("\n") + "\n" for line in lines))
+
+
+# --- SOURCES ---
+class SimulatedSource:
+    """Stand-in feed: replays the timetable at wall-clock time with drifting delays.
+
+    Emits about `rate` position reports per second spread over the trains in section,
+    plus DEP/ARR/EXIT events as trains pass nodes.
+    """
+
+    TICK = 0.05
+
+    def __init__(self, timetable, rate=2000, seed=0):
+        self.tt = timetable
+        self.rate = rate
+        self.rng = random.Random(seed)
+        self.delay = [self._initial_delay() for _ in range(len(timetable))]
+        self.position = {}   # train row -> last path position reported; never moves back
+        self.finished = set()   # train rows that have left the section today
+        self.day = None
+
+    def _initial_delay(self):
+        return 0.0 if self.rng.random() < 0.7 else round(self.rng.expovariate(1 / 6.0), 1)
+
+    def _locate(self, i, minute):
+        """(path position, km, at_node) of train row i at `minute`, or None if not in section."""
+        tt, delay = self.tt, self.delay[i]
+        base = i * N_NODES
+        if not tt.sched_dep[base] + delay <= minute < tt.sched_arr[base + N_NODES - 1] + delay:
+            return None
+        path = PATHS[tt.dirs[i]]
+        for k in range(N_NODES - 1):
+            dep, arr_next = tt.sched_dep[base + k] + delay, tt.sched_arr[base + k + 1] + delay
+            if minute < dep:
+                return k, NODES[path[k]]["km"], True
+            if minute < arr_next:
+                share = (minute - dep) / max(arr_next - dep, 1e-9)
+                km = NODES[path[k]]["km"] + share * (NODES[path[k + 1]]["km"] - NODES[path[k]]["km"])
+                return k, km, False
+        return N_NODES - 1, NODES[path[-1]]["km"], True
+
+    async def run(self, emit):
+        tt = self.tt
+        cursor = 0
+        while True:
+            now = time.time()
+            local = time.localtime(now)
+            minute = local.tm_hour * 60 + local.tm_min + local.tm_sec / 60.0
+            if local.tm_yday != self.day:   # a new day: every train runs again
+                self.day = local.tm_yday
+                self.finished.clear()
+            lines = []
+            active = []
+            for i in range(len(tt)):
+                if i in self.finished:
+                    continue
+                where = self._locate(i, minute)
+                previous = self.position.get(i)
+                if where is None:
+                    if previous is None:
+                        continue
+                    if minute >= tt.sched_arr[(i + 1) * N_NODES - 1] + self.delay[i]:   # reached its last node
+                        del self.position[i]
+                        self.finished.add(i)
+                        lines.append(self._line(now, i, N_NODES - 1, NODES[PATHS[tt.dirs[i]][-1]]["km"], EXIT))
+                        continue
+                    where = previous, NODES[PATHS[tt.dirs[i]][previous]]["km"], True   # drifted back before its departure
+                k, km, at_node = where
+                if previous is not None and k < previous:   # a later delay moves the booked path, not the train
+                    k, km = previous, NODES[PATHS[tt.dirs[i]][previous]]["km"]
+                active.append((i, k, km))
+                if previous is None:
+                    lines.append(self._line(now, i, k, km, DEP))
+                elif k > previous:
+                    lines.append(self._line(now, i, k, km, ARR))
+                self.position[i] = k
+            if active:
+                for _ in range(max(1, int(self.rate * self.TICK))):
+                    i, k, km = active[cursor % len(active)]
+                    cursor += 1
+                    if self.rng.random() < 0.01:
+                        self.delay[i] = max(-3.0, round(self.delay[i] + self.rng.gauss(0.0, 0.5), 1))
+                    lines.append(self._line(now, i, k, km, POS))
+            emit(lines)
+            await asyncio.sleep(max(0.0, self.TICK - (time.time() - now)))
+
+    def _line(self, now, i, k, km, event):
+        tt = self.tt
+        path = PATHS[tt.dirs[i]]
+        node = path[min(k + 1, N_NODES - 1)] if event == POS else path[k]
+        return f"{now:.3f},{tt.ids[i]},{TYPE_NAMES[tt.types[i]]},{tt.dirs[i]},{km:.2f},{node},{self.delay[i]},{EVENTS[event]}"
+
+
+class UdpSource:
+    """Receives feed lines as UDP datagrams (one or more newline-separated lines each)."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+
+    async def run(self, emit):
+        loop = asyncio.get_running_loop()
+
+        class Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                emit(data.decode("utf-8", "replace").splitlines())
+
+        await loop.create_datagram_endpoint(Protocol, local_addr=(self.host, self.port))
+        await asyncio.Event().wait()
+
+
+class FileTailSource:
+    """Follows a growing file of feed lines, like `tail -f`."""
+
+    def __init__(self, path, poll=0.05):
+        self.path, self.poll = path, poll
+
+    async def run(self, emit):
+        with open(self.path, "r", encoding="utf-8") as handle:
+            handle.seek(0, os.SEEK_END)
+            pending = ""
+            while True:
+                chunk = handle.read(1 << 16)
+                if not chunk:
+                    await asyncio.sleep(self.poll)
+                    continue
+                pending += chunk
+                *lines, pending = pending.split("\n")
+                emit(lines)
+
+
+def source_from_env(timetable, spec=None, seed=0):
+    """Pick the feed source from RAILWAY_FEED (or `spec`): "sim" (default), "sim:<messages
+    per second>", "udp://host:port" or "file:///path"."""
+    spec = os.environ.get("RAILWAY_FEED", "sim") if spec is None else spec
+    if spec.startswith("udp://"):
+        host, port = spec[len("udp://"):].rsplit(":", 1)
+        return UdpSource(host, int(port))
+    if spec.startswith("file://"):
+        return FileTailSource(spec[len("file://"):])
+    if spec.startswith("sim:"):
+        return SimulatedSource(timetable, rate=float(spec[len("sim:"):]), seed=seed)
+    return SimulatedSource(timetable, seed=seed)
+
+
+# --- DISPLAY HELPERS ---
+def next_stop(type_code, direction, next_node):
+    """First booked stop (or the end of the section) at or after `next_node`."""
+    path = PATHS[direction]
+    for node in path[path.index(next_node):]:
+        if node == path[-1] or stops_at(type_code, node):
+            return node
+    return path[-1]
+
+
+def train_rows(snapshot, timetable, prediction=None):
+    """Train List columns for a snapshot.
+
+    ETA and STATUS are the predicted arrival and delay at the next stop when an
+    eta.Prediction is given, otherwise the booked arrival plus the reported delay.
+    """
+    rows = {'ID': [], 'TYPE': [], 'NEXT STOP': [], 'ETA': [], 'STATUS': []}
+    for train, type_code, direction, node, delay in zip(snapshot.ids, snapshot.types, snapshot.dirs, snapshot.next_node, snapshot.delay):
+        stop = next_stop(type_code, direction, node)
+        row = timetable.index.get(train)
+        rows['ID'].append(train)
+        rows['TYPE'].append(TYPE_NAMES[type_code])
+        rows['NEXT STOP'].append(NODES[stop]["name"])
+        if row is None:
+            rows['ETA'].append("--")
+        else:
+            k = PATHS[direction].index(stop)
+            booked = timetable.sched_arr[row * N_NODES + k]
+            if prediction is not None and prediction.arr[row, k] == prediction.arr[row, k]:   # not NaN
+                delay = prediction.delay[row, k]
+            rows['ETA'].append(fmt_clock(booked + delay))
+        rows['STATUS'].append(status_text(delay))
+    return rows
+
+
+EVENT_TEXT = {DEP: "departed {}", ARR: "arrived at {}", EXIT: "left the section at {}"}
+
+
+def event_details(train, event, node):
+    return f"Train {train} {EVENT_TEXT[event].format(NODES[node]['label'])}."
+
+
+def section_kpis(snapshot, delays=None):
+    """Punctuality (%) and average delay of the trains currently in the section.
+
+    `delays` (one per train, e.g. Prediction.exit_delays) replaces the reported delays.
+    An early train counts as no delay, as in the simulator's results.
+    """
+    delays = snapshot.delay if delays is None else delays
+    if not snapshot.ids:
+        return 100.0, 0.0
+    on_time = sum(1 for delay in delays if delay <= PUNCTUALITY_THRESHOLD)
+    return 100.0 * on_time / len(snapshot.ids), sum(max(0.0, delay) for delay in delays) / len(snapshot.ids)
+
+
+def status_text(delay):
+    minutes = round(delay)
+    if minutes > 0:
+        return f"Delayed {minutes}m"
+    if minutes < 0:
+        return f"Early {-minutes}m"
+    return "On Time"
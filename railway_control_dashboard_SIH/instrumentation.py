@@ -0,0 +1,208 @@
+import bisect
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # optional: fall back to cProfile
+    Profiler = None
+
+METRICS_HOST = os.environ.get("RAILWAY_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("RAILWAY_METRICS_PORT", "9464"))
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)   # seconds
+RECENT = 512   # latest observations kept per series for the diagnostics panel
+
+HELP = {
+    "railway_section_seconds": "Time spent rendering a page section.",
+    "railway_rerun_seconds": "Time for a full script rerun.",
+    "railway_optimizer_solve_seconds": "Hold optimizer solve time.",
+    "railway_simulation_seconds": "Time to produce a Simulation Studio result, by where it came from.",
+    "railway_export_seconds": "Time to stream an audit trail or KPI history export.",
+    "railway_command_ack_seconds": "Time from a controller command to its acknowledgement by the sink.",
+}
+
+
+# --- HISTOGRAMS ---
+class Histogram:
+    __slots__ = ("counts", "total", "count", "recent")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=RECENT)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantile(self, q):
+        values = sorted(self.recent)
+        return values[min(int(q * len(values)), len(values) - 1)] if values else float("nan")
+
+
+# --- REGISTRY ---
+# Timings are pushed in as they happen. Everything else (feed lag, cache counters) is
+# pulled at scrape time from registered sources: objects with a metrics() method that
+# returns [(name, kind, labels dict, value), ...] with kind "counter" or "gauge".
+# Counters from several instances (one per page script) are summed; gauges take the max.
+_lock = threading.Lock()
+_histograms = {}            # (name, labels tuple) -> Histogram
+_sources = weakref.WeakSet()
+
+
+def observe(name, seconds, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+
+@contextmanager
+def section_timer(section, name="railway_section_seconds"):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, section=section)
+
+
+def timed(section):
+    """Decorator form of section_timer(), e.g. under @st.fragment."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with section_timer(section):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def register(source):
+    _sources.add(source)
+    return source
+
+
+def collect():
+    """{(name, labels tuple): (kind, value)} from every registered source."""
+    samples = {}
+    for source in list(_sources):
+        for name, kind, labels, value in source.metrics():
+            key = (name, tuple(sorted(labels.items())))
+            if key in samples:
+                previous = samples[key][1]
+                value = previous + value if kind == "counter" else max(previous, value)
+            samples[key] = (kind, value)
+    return samples
+
+
+def timings():
+    """Rows for the diagnostics panel: one per timed series."""
+    with _lock:
+        items = list(_histograms.items())
+    rows = []
+    for (name, labels), histogram in sorted(items):
+        rows.append({
+            "metric": name.replace("railway_", "").replace("_seconds", ""),
+            "labels": ", ".join(str(value) for _, value in labels),
+            "count": histogram.count,
+            "p50 ms": round(histogram.quantile(0.5) * 1000, 1),
+            "p95 ms": round(histogram.quantile(0.95) * 1000, 1),
+        })
+    return rows
+
+
+# --- PROMETHEUS EXPOSITION ---
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+
+def render():
+    lines = []
+    with _lock:
+        items = sorted((key, (list(h.counts), h.total, h.count)) for key, h in _histograms.items())
+    described = set()
+    for (name, labels), (counts, total, count) in items:
+        if name not in described:
+            described.add(name)
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, n in zip(BUCKETS + (float("inf"),), counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_labels(labels, [('le', le)])} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {total}")
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+    for (name, labels), (kind, value) in sorted(collect().items()):
+        if name not in described:
+            described.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Serve /metrics from a daemon thread; None if the port is taken (e.g. by another worker)."""
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError:
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+# --- PROFILING ---
+# Opt-in capture of a single rerun. pyinstrument is used when installed.
+def start_profile():
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def stop_profile(profiler, limit=40):
+    """Text report of a profile started with start_profile()."""
+    if Profiler is not None and isinstance(profiler, Profiler):
+        profiler.stop()
+        return profiler.output_text(unicode=True)
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
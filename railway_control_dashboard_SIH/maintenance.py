@@ -0,0 +1,108 @@
+import bisect
+import math
+
+import numpy as np
+
+from network import BLOCKS, DOWN, N_NODES, PUNCTUALITY_THRESHOLD, TYPE_NAMES, UP, path_block, run_minutes
+from simulation import SectionSimulator
+
+# --- MAINTENANCE WINDOW SEARCH ---
+# Ranks every start time for a block on one track section, STEP minutes apart, in one
+# batched run instead of one simulation per candidate. A single undisturbed run of the
+# day is forked at each candidate's scenario_bound (before the closure can change
+# anything) and each candidate continues its fork from there, not from midnight. A fork
+# also stops as soon as it has rejoined the undisturbed run, i.e. its state_key() matches
+# the baseline's at a checkpoint (every STEP until the day's last arrival): from there on
+# everything is as in the baseline. All candidates are then scored at once from their
+# stacked arrival times.
+#
+# A candidate still costs the hours its disruption lasts, and a block leaves a queue that
+# typically takes until the next gap in the timetable to clear, 3-6 hours on the
+# synthetic 200-train day. The search is therefore about 3x faster than simulating each
+# candidate separately for 1-2 hour blocks and about 1.5x for 4 hour blocks.
+STEP = 15.0   # minutes between candidate starts
+
+
+def candidate_starts(duration, step=STEP):
+    """Block starts (minutes) that keep a `duration`-hour block within the day."""
+    return np.arange(0.0, 24 * 60 - 60.0 * duration + step / 2, step)
+
+
+def rank_windows(timetable, section, duration, step=STEP):
+    """Every window for closing `section` for `duration` hours, least disruptive first.
+
+    One dict per candidate: start and end (minutes), added_delay (train-minutes late at
+    the end of the section, against the undisturbed day), avg_delay, punctuality,
+    new_conflicts, displaced (trains whose undisturbed path is in the section during the
+    window) and rejoined (when the run was back to the undisturbed one, None if never).
+    Gives the same scores as run_scenario() for each candidate, in about a third to two
+    thirds of the time (see above).
+    """
+    block = BLOCKS.index(section)
+    starts = candidate_starts(duration, step)
+    ends = starts + 60.0 * duration
+    lead = max(run_minutes(code, block) for code in range(len(TYPE_NAMES)))   # as in scenario_bound
+    marks = [math.nextafter(start - lead, -math.inf) for start in starts]
+
+    # The undisturbed day, once: a fork for each candidate at its own checkpoint, and its
+    # state every `step` from the first checkpoint until the last train has arrived.
+    sim = SectionSimulator(timetable)
+    forks, checkpoints = [], []
+    for mark in marks:
+        forks.append(sim.run(until=mark).fork())
+        checkpoints.append(_checkpoint(sim, mark))
+    mark = marks[-1]
+    while sim.events:
+        mark += step
+        checkpoints.append(_checkpoint(sim.run(until=mark), mark))
+    baseline = sim.result()
+    base_arr, base_dep = np.asarray(baseline.arr), np.asarray(baseline.dep)
+    times = [checkpoint[0] for checkpoint in checkpoints]
+
+    arrivals = np.empty((len(starts), len(timetable)))
+    conflicts = np.empty(len(starts))
+    rejoined = [None] * len(starts)
+    for k, (fork, start, end) in enumerate(zip(forks, starts, ends)):
+        fork.close_block(block, start, end)
+        for mark, pos, last_exit, key, conflicts_then in checkpoints[bisect.bisect_right(times, end):]:
+            fork.run(until=mark)
+            # Trains in the same places and lines last left at the same times are cheap to
+            # compare; only then is the full key worth building.
+            if fork.pos == pos and fork.last_exit == last_exit and fork.state_key() == key:
+                rejoined[k] = mark
+                conflicts[k] = fork.conflicts + baseline.conflicts - conflicts_then
+                break
+        else:
+            conflicts[k] = fork.run().conflicts
+        final = np.asarray(fork.arr)[N_NODES - 1::N_NODES]
+        arrivals[k] = np.where(np.isnan(final), base_arr[N_NODES - 1::N_NODES], final)   # rejoined: the rest as undisturbed
+
+    # --- SCORING ---
+    booked = np.asarray(timetable.sched_arr, dtype=np.float64)[N_NODES - 1::N_NODES]
+    delay = arrivals - booked
+    late = np.maximum(delay, 0.0)
+    base_late = np.maximum(base_arr[N_NODES - 1::N_NODES] - booked, 0.0).sum()
+    added = late.sum(axis=1) - base_late
+    avg_delay = late.mean(axis=1) if len(timetable) else np.zeros(len(starts))
+    punctuality = 100.0 * (delay <= PUNCTUALITY_THRESHOLD).mean(axis=1) if len(timetable) else np.full(len(starts), 100.0)
+    # Position along its path at which each direction runs through the block (path_block is its own inverse).
+    position = np.array([path_block(UP, block), path_block(DOWN, block)])[np.asarray(timetable.dirs, dtype=np.intp)]
+    slots = np.arange(len(timetable)) * N_NODES + position
+    entered, left = np.sort(base_dep[slots]), np.sort(base_arr[slots + 1])
+    displaced = np.searchsorted(entered, ends, side="left") - np.searchsorted(left, starts, side="right")
+
+    order = np.lexsort((starts, displaced, np.round(added, 6)))
+    return [
+        {
+            "start": float(starts[k]), "end": float(ends[k]), "added_delay": float(added[k]),
+            "avg_delay": float(avg_delay[k]), "punctuality": float(punctuality[k]),
+            "new_conflicts": int(conflicts[k] - baseline.conflicts), "displaced": int(displaced[k]),
+            "rejoined": rejoined[k],
+        }
+        for k in order
+    ]
+
+
+def _checkpoint(sim, mark):
+    """(time, pos, last_exit, state_key, conflicts) of a run stopped at `mark`."""
+    return mark, sim.pos[:], sim.last_exit[:], sim.state_key(), sim.conflicts
@@ -0,0 +1,71 @@
+# --- SECTION NETWORK MODEL ---
+# Static description of the controlled section between Station A and Station B.
+# Everything that needs the layout (simulator, timetable, dashboards) reads it from here.
+
+# --- NODES (STATIONS & LOOPS) ---
+# Listed from Station A to Station B. "loops" is the number of loop lines per direction
+# where a train can stand clear of the main line (and be overtaken).
+NODES = [
+    {"name": "Station A", "label": "Station A", "km": 0.0, "loops": 3},
+    {"name": "Durg", "label": "Durg", "km": 14.0, "loops": 1},
+    {"name": "SL-02", "label": "Siding SL-02", "km": 35.0, "loops": 1},
+    {"name": "Raipur", "label": "Raipur", "km": 51.0, "loops": 2},
+    {"name": "Nagpur", "label": "Nagpur", "km": 70.0, "loops": 1},
+    {"name": "Station B", "label": "Station B", "km": 84.0, "loops": 3},
+]
+NODE_NAMES = [node["name"] for node in NODES]
+N_NODES = len(NODES)
+
+# --- BLOCK SECTIONS ---
+# Block i joins NODES[i] and NODES[i + 1]. The line is double track, so each block has
+# one running line per direction and is worked under absolute block.
+BLOCKS = ["Section A-1", "Main Line 1", "Main Line 2", "Section B-1", "Section B-2"]
+N_BLOCKS = len(BLOCKS)
+BLOCK_KM = [NODES[i + 1]["km"] - NODES[i]["km"] for i in range(N_BLOCKS)]
+
+# --- DIRECTIONS ---
+UP, DOWN = 0, 1  # UP runs Station A -> Station B, DOWN runs Station B -> Station A
+ORIGINS = {"Station A": UP, "Station B": DOWN}
+
+# --- OPERATING RULES (MINUTES) ---
+HEADWAY = 4.0              # minimum gap between two trains entering the same block line
+DWELL = 2.0                # booked stop at a station
+RECOVERY_ALLOWANCE = 0.05  # timetable padding on top of the technical run time
+PUNCTUALITY_THRESHOLD = 5.0  # a train is "on time" if it arrives at most this late
+UTILIZATION_LIMIT = 75.0   # % of a block line's time; UIC 406 guide value for peak hours on mixed-traffic lines
+
+# --- TRAIN CLASSES ---
+# speed in km/h; priority is used for precedence at loops (higher goes first).
+TRAIN_TYPES = {
+    "Rajdhani": {"speed": 110.0, "priority": 4, "stops": ["Raipur"]},
+    "Express": {"speed": 90.0, "priority": 3, "stops": ["Durg", "Raipur", "Nagpur"]},
+    "Local": {"speed": 60.0, "priority": 2, "stops": ["Durg", "Raipur", "Nagpur"]},
+    "Freight": {"speed": 50.0, "priority": 1, "stops": []},
+    "Maintenance": {"speed": 40.0, "priority": 0, "stops": []},
+}
+TYPE_NAMES = list(TRAIN_TYPES)
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+PRIORITY = [TRAIN_TYPES[name]["priority"] for name in TYPE_NAMES]
+
+
+def path_nodes(direction):
+    """Node indexes in running order for a direction."""
+    return list(range(N_NODES)) if direction == UP else list(range(N_NODES - 1, -1, -1))
+
+
+def path_block(direction, k):
+    """Block index a train of `direction` uses after the k-th node of its path."""
+    return k if direction == UP else N_BLOCKS - 1 - k
+
+
+def run_minutes(type_code, block):
+    return BLOCK_KM[block] / TRAIN_TYPES[TYPE_NAMES[type_code]]["speed"] * 60.0
+
+
+def stops_at(type_code, node):
+    return NODE_NAMES[node] in TRAIN_TYPES[TYPE_NAMES[type_code]]["stops"]
+
+
+def fmt_clock(minutes):
+    minutes = int(round(minutes)) % (24 * 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
@@ -0,0 +1,202 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+from conflicts import planned_occupancies
+from instrumentation import observe
+from network import HEADWAY, N_NODES, NODES, PRIORITY, TYPE_NAMES, UP, path_nodes
+from simulation import SectionSimulator
+
+# --- OBJECTIVE ---
+# Weighted arrival delay at the end of the section, by the TYPE shown in the Train List,
+# plus a small charge per minute of hold so equally good plans prefer fewer, shorter holds.
+PRIORITY_WEIGHT = {"Rajdhani": 8.0, "Express": 4.0, "Local": 2.0, "Freight": 1.0, "Maintenance": 0.5}
+HOLD_PENALTY = 0.05
+HOLD_STEP = 2.0    # minutes a local-search move lengthens/shortens a hold by
+MAX_HOLD = 30.0
+HORIZON = 120.0    # minutes ahead of now that are optimised
+
+
+@dataclass
+class HoldPlan:
+    holds: dict           # (train id, node) -> minutes to hold there
+    objective: float
+    lower_bound: float    # weighted delay if trains did not interact at all
+    solve_ms: float
+    evaluations: int
+    warm_start: bool
+    converged: bool       # False if the time budget ran out before a local optimum
+    explanation: dict = None
+
+    @property
+    def gap(self):
+        return (self.objective - self.lower_bound) / self.objective if self.objective > 1e-9 else 0.0
+
+
+# --- ANYTIME HOLD OPTIMIZER ---
+# Decisions are holds of a train at a node (it stands on a loop while others pass), which
+# covers precedence at loops on this double-track section. Plans are scored by simulating
+# the trains in the optimisation window. Search is first-improvement local search over
+# holds seeded from the detected conflicts; the best plan so far is always available, so
+# the solver stops at a local optimum or when the time budget runs out, whichever is
+# first. Each solve starts from the previous tick's plan when that scores better than
+# holding nothing, so a small disturbance usually needs a single neighbourhood pass.
+class HoldOptimizer:
+    def __init__(self):
+        self.previous = {}
+        self.rejected = set()
+        self.lock = threading.Lock()
+
+    def reject(self, train, node):
+        """Never propose this hold again (controller rejected it)."""
+        with self.lock:
+            self.rejected.add((train, node))
+            self.previous.pop((train, node), None)
+
+    def solve(self, timetable, delays, now, conflicts, budget_ms=300, horizon=HORIZON, seed=0):
+        """Best hold plan found within `budget_ms` for trains running in [now, now + horizon)."""
+        with self.lock:
+            plan = self._solve(timetable, delays, now, conflicts, budget_ms, horizon, seed)
+        observe("railway_optimizer_solve_seconds", plan.solve_ms / 1000.0)
+        return plan
+
+    def _solve(self, timetable, delays, now, conflicts, budget_ms, horizon, seed):
+        started = time.perf_counter()
+        deadline = started + budget_ms / 1000.0
+
+        # Trains running (or due to run) inside the window, and where they can still be held.
+        rows = []
+        for i in range(len(timetable)):
+            delay = delays.get(timetable.ids[i], 0.0)
+            base = i * N_NODES
+            if timetable.sched_dep[base] + delay < now + horizon and timetable.sched_arr[base + N_NODES - 1] + delay >= now:
+                rows.append(i)
+        sub = timetable.subset(rows)
+        local = {train: j for j, train in enumerate(sub.ids)}
+        initial_delay = {j: delays[train] for train, j in local.items() if delays.get(train)}
+        weights = [PRIORITY_WEIGHT[sub.type_name(j)] for j in range(len(sub))]
+
+        plans = [planned_occupancies(sub, j, initial_delay.get(j, 0.0)) for j in range(len(sub))]
+        lower_bound = sum(
+            w * max(plan[-1][2] - sub.sched_arr[j * N_NODES + N_NODES - 1], 0.0)
+            for j, (w, plan) in enumerate(zip(weights, plans))
+        )
+
+        def holdable(j, node):
+            k = path_nodes(sub.dirs[j]).index(node)
+            entry = plans[j][k][1] if k < len(plans[j]) else None
+            return (entry is not None and entry >= now and NODES[node]["loops"] > 0
+                    and (sub.ids[j], node) not in self.rejected)
+
+        # Candidate holds, each with "jump" values that resolve a conflict outright.
+        candidates = {}
+        for conflict in conflicts:
+            if conflict.ahead not in local or conflict.behind not in local:
+                continue
+            a, b = local[conflict.ahead], local[conflict.behind]
+            block, d = divmod(conflict.line, 2)
+            node = block if d == UP else block + 1
+            k = path_nodes(d).index(node)
+            entry_a, entry_b = plans[a][k][1], plans[b][k][1]
+            for j, value in ((b, conflict.severity), (a, entry_b - entry_a + HEADWAY)):
+                if holdable(j, node):
+                    candidates.setdefault((j, node), set()).add(round(min(value, MAX_HOLD)))
+
+        cache = {}
+        evaluations = 0
+
+        def evaluate(holds):
+            nonlocal evaluations
+            key = frozenset(holds.items())
+            if key not in cache:
+                evaluations += 1
+                result = SectionSimulator(sub, initial_delay=initial_delay, holds=holds).run().result()
+                objective = sum(w * max(delay, 0.0) for w, delay in zip(weights, result.final_delay))
+                cache[key] = (objective + HOLD_PENALTY * sum(holds.values()), result)
+            return cache[key][0]
+
+        # Warm start from the previous tick's holds that still apply.
+        warm = {
+            (local[train], node): minutes for (train, node), minutes in self.previous.items()
+            if train in local and holdable(local[train], node)
+        }
+        for hold in warm:
+            candidates.setdefault(hold, set())
+        current, current_value = {}, evaluate({})
+        warm_start = bool(warm) and evaluate(warm) <= current_value
+        if warm_start:
+            current, current_value = warm, evaluate(warm)
+
+        rng = random.Random(seed)
+        converged = False
+        while time.perf_counter() < deadline:
+            moves = []
+            for hold, jumps in candidates.items():
+                value = current.get(hold, 0.0)
+                options = jumps | {0.0, value + HOLD_STEP, max(value - HOLD_STEP, 0.0)}
+                moves.extend((hold, option) for option in options if option != value and option <= MAX_HOLD)
+            rng.shuffle(moves)
+            improved = False
+            for hold, option in moves:
+                if time.perf_counter() >= deadline:
+                    break
+                trial = dict(current)
+                if option > 0:
+                    trial[hold] = option
+                else:
+                    trial.pop(hold, None)
+                trial_value = evaluate(trial)
+                if trial_value < current_value - 1e-6:
+                    current, current_value = trial, trial_value
+                    improved = True
+                    break
+            if not improved:
+                converged = time.perf_counter() < deadline
+                break
+
+        self.previous = {(sub.ids[j], node): minutes for (j, node), minutes in current.items()}
+        return HoldPlan(
+            holds=dict(self.previous),
+            objective=current_value,
+            lower_bound=lower_bound,
+            solve_ms=(time.perf_counter() - started) * 1000.0,
+            evaluations=evaluations,
+            warm_start=warm_start,
+            converged=converged,
+            explanation=self._explain(sub, current, evaluate, cache),
+        )
+
+    def _explain(self, sub, holds, evaluate, cache):
+        """Describe the most urgent hold: who it lets past and the delay it saves them."""
+        if not holds:
+            return None
+        result = cache[frozenset(holds.items())][1]
+        positions = {hold: path_nodes(sub.dirs[hold[0]]).index(hold[1]) for hold in holds}
+        j, node = min(holds, key=lambda hold: result.arr[hold[0] * N_NODES + positions[hold]])
+        k = positions[(j, node)]
+        arrived, departed = result.arr[j * N_NODES + k], result.dep[j * N_NODES + k]
+        passing = [
+            m for m in range(len(sub))
+            if m != j and sub.dirs[m] == sub.dirs[j] and arrived <= result.dep[m * N_NODES + k] <= departed
+        ]
+        winner = max(passing, key=lambda m: PRIORITY[sub.types[m]]) if passing else None
+
+        without = dict(holds)
+        del without[(j, node)]
+        evaluate(without)
+        unheld = cache[frozenset(without.items())][1]
+        if winner is not None:
+            saved = unheld.final_delay[winner] - result.final_delay[winner]
+        else:
+            saved = sum(max(d, 0.0) for d in unheld.final_delay) - sum(max(d, 0.0) for d in result.final_delay)
+        return {
+            "train": sub.ids[j],
+            "type": TYPE_NAMES[sub.types[j]],
+            "node": node,
+            "node_label": NODES[node]["label"],
+            "minutes": round(holds[(j, node)]),
+            "for_train": sub.ids[winner] if winner is not None else None,
+            "for_type": TYPE_NAMES[sub.types[winner]] if winner is not None else None,
+            "saved": saved,
+        }
@@ -1,24 +1,17 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import numpy as np
+import datetime
+import time
 
-# --- PAGE CONFIGURATION ---
-st.set_page_config(
-    page_title="Performance & Audit",
-    page_icon="📊",
-    layout="wide",
-)
+from app_shell import load_audit_store, load_compute_cache, load_export_server, load_rollups, page_shell
+from audit_store import PAGE_SIZE
+from export import FORMATS, export_url
+from instrumentation import section_timer
+from rollups import MAX_POINTS, PERIODS, lttb
 
-# --- SHARED STYLES ---
-st.markdown("""
-    <style>
-        .stApp { background-color: #0E1117; }
-        .stMetric { border: 1px solid #262730; border-radius: 10px; padding: 15px; background-color: #1a1c22; box-shadow: 0 4px 8px 0 rgba(0,0,0,0.2); }
-        .stButton>button { width: 100%; border-radius: 8px; }
-        .st-emotion-cache-1r6slb0 { border-radius: 10px; border: 1px solid #262730; }
-    </style>
-""", unsafe_allow_html=True)
+# --- PAGE CONFIGURATION & SHARED STYLES ---
+page_shell(page_title="Performance & Audit", page_icon="📊")
 
 # --- HEADER ---
 st.title("📊 Performance & Audit Center")
@@ -33,81 +26,110 @@ time_period = st.selectbox(
     key="time_period"
 )
 
-# --- GENERATE SAMPLE DATA FOR CHARTS ---
-def generate_chart_data(period):
-    if period == "Last 24 Hours":
-        points = 24
-        freq = 'H'
-    elif period == "Last 7 Days":
-        points = 7
-        freq = 'D'
-    else:
-        points = 30
-        freq = 'D'
-    
-    timestamps = pd.to_datetime(pd.date_range(end=pd.Timestamp.now(), periods=points, freq=freq))
-    punctuality = np.random.uniform(low=85.0, high=98.0, size=points).round(1)
-    avg_delay = np.random.uniform(low=1.5, high=5.0, size=points).round(1)
-    
+# --- KPI DATA FOR CHARTS ---
+# Each period reads its own rollup tier; long series are thinned with LTTB per chart so
+# the browser never gets more than MAX_POINTS points.
+def chart_data(series, column, name):
+    times = [row[0] for row in series]
+    values = [row[column] for row in series]
+    keep = lttb(times, values, MAX_POINTS)
     return pd.DataFrame({
-        'Time': timestamps,
-        'Punctuality (%)': punctuality,
-        'Average Delay (min)': avg_delay
+        'Time': [datetime.datetime.fromtimestamp(times[i]) for i in keep],
+        name: [values[i] for i in keep],
     })
 
-chart_data = generate_chart_data(time_period)
+def period_charts(period):
+    kpi_series = load_rollups().period(period)
+    return chart_data(kpi_series, 1, 'Punctuality (%)'), chart_data(kpi_series, 2, 'Average Delay (min)')
 
-# --- DISPLAY CHARTS ---
-col1, col2 = st.columns(2)
-with col1:
-    fig_punctuality = px.line(
-        chart_data, x='Time', y='Punctuality (%)',
-        title='Punctuality Over Time', markers=True,
-        template='plotly_dark'
-    )
-    fig_punctuality.update_layout(yaxis_range=[80,100])
-    st.plotly_chart(fig_punctuality, use_container_width=True)
-
-with col2:
-    fig_delay = px.area(
-        chart_data, x='Time', y='Average Delay (min)',
-        title='Average Delay Over Time', markers=True,
-        template='plotly_dark'
-    )
-    st.plotly_chart(fig_delay, use_container_width=True)
+cache = load_compute_cache()
+with section_timer("charts"):
+    punctuality_data, delay_data = cache.get(("kpi_charts", time_period), lambda: period_charts(time_period), ttl=30.0)
+    if punctuality_data.empty:
+        st.info("No arrivals recorded for this period yet. KPIs build up while the live feed is running.")
+
+    # --- DISPLAY CHARTS ---
+    col1, col2 = st.columns(2)
+    with col1:
+        fig_punctuality = px.line(
+            punctuality_data, x='Time', y='Punctuality (%)',
+            title='Punctuality Over Time', markers=True,
+            template='plotly_dark'
+        )
+        fig_punctuality.update_layout(yaxis_range=[80,100])
+        st.plotly_chart(fig_punctuality, use_container_width=True)
+
+    with col2:
+        fig_delay = px.area(
+            delay_data, x='Time', y='Average Delay (min)',
+            title='Average Delay Over Time', markers=True,
+            template='plotly_dark'
+        )
+        st.plotly_chart(fig_delay, use_container_width=True)
 
 st.divider()
 
 # --- AUDIT TRAIL SECTION ---
 st.subheader("📜 Audit Trail")
 
-audit_data = {
-    'Timestamp': pd.to_datetime(['2025-09-28 11:39:35', '2025-09-28 11:40:12', '2025-09-28 11:42:05', '2025-09-28 11:45:30']),
-    'User': ['SYSTEM', 'Controller_A', 'Controller_A', 'SYSTEM'],
-    'Event Type': ['AI Recommendation', 'User Action', 'Manual Override', 'Conflict Resolution'],
-    'Details': [
-        "Hold Train 45678 for 6 mins.",
-        "Rejected AI Recommendation for Train 45678.",
-        "Executed 'Proceed Via Main Line' for Train 45678.",
-        "AI automatically rerouted Train 54321 to avoid conflict."
-    ]
-}
-audit_df = pd.DataFrame(audit_data)
+store = load_audit_store()
 
 # --- FILTERS FOR THE AUDIT LOG ---
-filter_col1, filter_col2 = st.columns([1, 2])
-with filter_col1:
-    user_filter = st.selectbox("Filter by User", ["All"] + list(audit_df['User'].unique()))
-with filter_col2:
-    event_filter = st.selectbox("Filter by Event Type", ["All"] + list(audit_df['Event Type'].unique()))
-
-filtered_df = audit_df.copy()
-if user_filter != "All":
-    filtered_df = filtered_df[filtered_df['User'] == user_filter]
-if event_filter != "All":
-    filtered_df = filtered_df[filtered_df['Event Type'] == event_filter]
+with section_timer("audit_filter"):
+    filter_col1, filter_col2 = st.columns([1, 2])
+    with filter_col1:
+        user_filter = st.selectbox("Filter by User", ["All"] + store.distinct("user"))
+    with filter_col2:
+        event_filter = st.selectbox("Filter by Event Type", ["All"] + store.distinct("event_type"))
+
+    # Pages are fetched by key: the stack holds the (ts, id) each page starts after.
+    # The selected period applies here as it does to the export below.
+    if st.session_state.get("audit_filters") != (user_filter, event_filter, time_period):
+        st.session_state.audit_filters = (user_filter, event_filter, time_period)
+        st.session_state.audit_cursors = [None]
+    cursors = st.session_state.audit_cursors
+    rows = cache.get(
+        ("audit_page", user_filter, event_filter, time_period, cursors[-1]),
+        lambda: store.page(
+            user=None if user_filter == "All" else user_filter,
+            event_type=None if event_filter == "All" else event_filter,
+            before=cursors[-1],
+            since=time.time() - PERIODS[time_period][1],
+        ),
+        ttl=2.0,
+    )
+    filtered_df = pd.DataFrame(
+        [(datetime.datetime.fromtimestamp(ts), user, event_type, details) for _, ts, user, event_type, details in rows],
+        columns=['Timestamp', 'User', 'Event Type', 'Details'],
+    )
 
 # --- DISPLAY THE AUDIT LOG ---
 # MODIFICATION: Updated parameter to use_container_width for the dataframe.
 st.dataframe(filtered_df, use_container_width=True, hide_index=True)
 
+page_col1, page_col2, page_col3 = st.columns([1, 1, 4])
+if page_col1.button("← Newer", disabled=len(cursors) == 1, use_container_width=True):
+    cursors.pop()
+    st.rerun()
+if page_col2.button("Older →", disabled=len(rows) < PAGE_SIZE, use_container_width=True):
+    cursors.append((rows[-1][1], rows[-1][0]))
+    st.rerun()
+page_col3.caption(f"Page {len(cursors)} · {PAGE_SIZE} events per page, newest first")
+
+# --- EXPORT ---
+# Links to the export endpoint (export.py), which streams the full filtered trail and the
+# KPI history for the selected period straight from the stores; nothing is built here.
+load_export_server()
+export_col1, export_col2, export_col3 = st.columns([1, 2, 2])
+export_format = export_col1.selectbox("Export Format", list(FORMATS), key="export_format")
+export_col2.link_button(
+    f"⬇️ Audit Trail ({time_period})",
+    export_url("audit", export_format, user=user_filter, event_type=event_filter, period=time_period),
+    use_container_width=True,
+)
+export_col3.link_button(
+    f"⬇️ KPI History ({time_period})",
+    export_url("kpi", export_format, period=time_period),
+    use_container_width=True,
+)
+
@@ -0,0 +1,177 @@
+import bisect
+import os
+import threading
+import time
+
+from capacity import CapacityEngine
+from conflicts import ConflictDetector
+from eta import EtaPredictor
+from feed import EMPTY_SNAPSHOT, FEED_LOG, FeedIngest, Snapshot
+from optimizer import HoldOptimizer
+
+# --- HISTORICAL REPLAY ---
+# A recorded day (see FeedRecorder) is indexed once with a keyframe every
+# KEYFRAME_INTERVAL seconds of feed time: the section snapshot at that moment and the
+# byte offset of the next line. The state at any time is then one keyframe plus the
+# short tail of lines after it, never a replay from midnight. Today's log keeps growing,
+# so the index is extended from where it stopped whenever it is opened again.
+KEYFRAME_INTERVAL = 120.0   # seconds of feed time
+SPEEDS = [1, 2, 5, 10, 30, 60]
+
+
+class _ReplayState(FeedIngest):
+    """Train and event rings rebuilt from a log, not a live feed: no source, no metrics."""
+
+    def __init__(self, snapshot=EMPTY_SNAPSHOT):
+        super().__init__(source=None)
+        for train, type_code, direction, km, node, delay, updated in zip(
+            snapshot.ids, snapshot.types, snapshot.dirs, snapshot.km, snapshot.next_node, snapshot.delay, snapshot.updated,
+        ):
+            slot = self.state.slot(train)
+            self.state.types[slot], self.state.dirs[slot], self.state.km[slot] = type_code, direction, km
+            self.state.next_node[slot], self.state.delay[slot], self.state.updated[slot] = node, delay, updated
+            self.state.active[slot] = 1
+        for event in snapshot.events:
+            self.events.append(*event)
+
+    def snapshot(self, ts):
+        # Versioned by feed time (ms), so the same moment of the same day is the same snapshot
+        # for every session replaying it.
+        return Snapshot(int(ts * 1000), ts, *self.state.snapshot_columns(), self.events.tail(50))
+
+    def metrics(self):
+        return []
+
+
+def recorded_days(name=""):
+    """Dates with a feed log for the section recorded as `name` ("" for the in-process feed), newest first."""
+    suffix = f"-{name}.csv" if name else ".csv"
+    days = []
+    for filename in os.listdir(FEED_LOG) if os.path.isdir(FEED_LOG) else []:
+        day = filename[:-len(suffix)]
+        if filename.endswith(suffix) and len(day) == 10:
+            days.append(day)
+    return sorted(days, reverse=True)
+
+
+def log_path(day, name=""):
+    return os.path.join(FEED_LOG, f"{day}-{name}.csv" if name else f"{day}.csv")
+
+
+class ReplayIndex:
+    """Keyframes of one day's feed log, shared by every session replaying it."""
+
+    def __init__(self, path):
+        self.path = path
+        self.times = []       # feed time of each keyframe
+        self.keyframes = []   # (snapshot, offset of the first line after it)
+        self.start = self.end = None
+        self.scanned = 0      # offset up to which lines are indexed
+        self.scanner = _ReplayState()
+        self.lock = threading.Lock()
+        self.extend()
+
+    def extend(self):
+        """Index lines appended to the log since the last call."""
+        with self.lock, open(self.path, "rb") as handle:
+            handle.seek(self.scanned)
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break     # still being written
+                ts = _timestamp(line)
+                if ts is not None:
+                    if self.start is None:
+                        self.start = ts
+                    if not self.times or ts - self.times[-1] >= KEYFRAME_INTERVAL:
+                        self.times.append(ts)
+                        self.keyframes.append((self.scanner.snapshot(ts), self.scanned))
+                    self.scanner.ingest([line.decode("utf-8", "replace")])
+                    self.end = ts
+                self.scanned += len(line)
+        return self
+
+    def restore(self, ts):
+        """(state, offset) at the last keyframe at or before `ts`."""
+        k = max(bisect.bisect_right(self.times, ts) - 1, 0)
+        snapshot, offset = self.keyframes[k]
+        return _ReplayState(snapshot), offset
+
+    def advance(self, state, offset, ts):
+        """Apply lines from `offset` up to feed time `ts`; returns the offset of the first line not applied."""
+        with open(self.path, "rb") as handle:
+            handle.seek(offset)
+            while offset < self.scanned:
+                line = handle.readline()
+                stamp = _timestamp(line)
+                if stamp is not None and stamp > ts:
+                    break
+                state.ingest([line.decode("utf-8", "replace")])
+                offset += len(line)
+        return offset
+
+
+def _timestamp(line):
+    try:
+        return float(line.split(b",", 1)[0])
+    except ValueError:
+        return None
+
+
+# --- REPLAY SESSION ---
+class ReplayFeed:
+    """A recorded day played back to the Live page in place of the live feed.
+
+    `latest` is the snapshot at the replay clock, which runs at `speed` times real time
+    from the last seek while playing. Holds its own conflict detector, ETA predictor,
+    capacity engine and optimizer for `timetable`: the live ones keep incremental state
+    that replayed delays must not overwrite, and rejecting a replayed recommendation
+    must not touch the live one.
+    """
+
+    def __init__(self, index, timetable, speed=1):
+        self.index = index
+        self.speed = speed
+        self.position = index.start
+        self.started = None          # wall time play was pressed, None while paused
+        self.state, self.offset, self.applied = None, 0, float("inf")
+        self.detector = ConflictDetector()
+        self.predictor = EtaPredictor(timetable)
+        self.capacity = CapacityEngine(timetable)
+        self.optimizer = HoldOptimizer()
+
+    @property
+    def playing(self):
+        return self.started is not None
+
+    def clock(self):
+        """Feed time being shown (epoch seconds)."""
+        if self.started is None:
+            return self.position
+        return min(self.position + (time.time() - self.started) * self.speed, self.index.end)
+
+    def play(self):
+        if self.started is None:
+            self.started = time.time()
+
+    def pause(self):
+        self.position, self.started = self.clock(), None
+
+    def seek(self, ts):
+        self.position = min(max(ts, self.index.start), self.index.end)
+        if self.started is not None:
+            self.started = time.time()
+
+    def set_speed(self, speed):
+        self.position = self.clock()
+        if self.started is not None:
+            self.started = time.time()
+        self.speed = speed
+
+    @property
+    def latest(self):
+        ts = self.clock()
+        if ts < self.applied or ts - self.applied > KEYFRAME_INTERVAL:
+            self.state, self.offset = self.index.restore(ts)
+        self.offset = self.index.advance(self.state, self.offset, ts)
+        self.applied = ts
+        return self.state.snapshot(ts)
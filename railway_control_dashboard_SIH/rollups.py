@@ -0,0 +1,179 @@
+import threading
+import time
+
+from audit_store import AUDIT_DB, EXPORT_CHUNK, FLUSH_INTERVAL, connect
+from feed import ARR, EXIT
+from network import PUNCTUALITY_THRESHOLD
+
+# --- ROLLUP TIERS ---
+# Punctuality and average delay are kept as running sums per time bucket at three
+# resolutions, so a chart reads at most a few thousand pre-aggregated rows whatever the
+# period. Every arrival (at a station or at the end of the section) is one observation.
+# Finer tiers are pruned after RETENTION seconds; the day tier is kept for good.
+TIERS = {"minute": 60, "hour": 3600, "day": 86400}
+RETENTION = {"minute": 3 * 86400, "hour": 90 * 86400, "day": None}
+PERIODS = {
+    "Last 24 Hours": ("minute", 86400),
+    "Last 7 Days": ("hour", 7 * 86400),
+    "Last 30 Days": ("day", 30 * 86400),
+}
+MAX_POINTS = 300          # points per chart trace sent to the browser
+PRUNE_INTERVAL = 3600.0   # seconds between retention passes
+
+SCHEMA = "".join(
+    f"CREATE TABLE IF NOT EXISTS kpi_{tier} (bucket INTEGER PRIMARY KEY, observations INTEGER NOT NULL, "
+    f"on_time INTEGER NOT NULL, delay_sum REAL NOT NULL);\n"
+    for tier in TIERS
+)
+
+
+def bucket_start(ts, tier):
+    """Start of the bucket holding `ts`, on local time: day buckets start at local midnight,
+    including across daylight saving changes (such a day is 23 or 25 hours long)."""
+    size = TIERS[tier]
+    offset = time.localtime(ts).tm_gmtoff
+    local_start = (ts + offset) // size * size
+    return int(local_start - time.localtime(local_start - offset).tm_gmtoff)   # the start's own offset
+
+
+# --- INCREMENTAL ROLLUPS ---
+# Observations are merged into per-bucket sums in memory as feed batches arrive; a
+# background thread upserts the touched buckets every FLUSH_INTERVAL, so each flush costs
+# a handful of rows per tier no matter how busy the feed is.
+class KpiRollups:
+    def __init__(self, path=AUDIT_DB):
+        self.path = path
+        self.pending = {tier: {} for tier in TIERS}   # tier -> bucket -> [observations, on_time, delay_sum]
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.writer = None
+        self.pruned = 0.0
+        conn = connect(path)
+        conn.executescript(SCHEMA)
+        conn.close()
+
+    def start(self):
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._write_loop, name="kpi-rollups", daemon=True)
+            self.writer.start()
+        return self
+
+    def add_many(self, observations):
+        """Fold [(ts, delay minutes), ...] into every tier."""
+        with self.lock:
+            for tier, buckets in self.pending.items():
+                for ts, delay in observations:
+                    totals = buckets.setdefault(bucket_start(ts, tier), [0, 0, 0.0])
+                    totals[0] += 1
+                    totals[1] += delay <= PUNCTUALITY_THRESHOLD
+                    totals[2] += delay
+
+    def add_feed_events(self, events):
+        """on_events hook for FeedIngest: arrivals are the observations."""
+        self.add_many([(ts, delay) for ts, _, event, _, delay in events if event in (ARR, EXIT)])
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {tier: {} for tier in TIERS}
+        conn = self._connection()
+        with conn:
+            for tier, buckets in pending.items():
+                conn.executemany(
+                    f"INSERT INTO kpi_{tier} VALUES (?, ?, ?, ?) ON CONFLICT (bucket) DO UPDATE SET "
+                    "observations = observations + excluded.observations, on_time = on_time + excluded.on_time, "
+                    "delay_sum = delay_sum + excluded.delay_sum",
+                    [(bucket, *totals) for bucket, totals in buckets.items()],
+                )
+            now = time.time()
+            if now - self.pruned > PRUNE_INTERVAL:
+                self.pruned = now
+                for tier, keep in RETENTION.items():
+                    if keep is not None:
+                        conn.execute(f"DELETE FROM kpi_{tier} WHERE bucket < ?", (now - keep,))
+
+    def _write_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def _connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = connect(self.path)
+        return conn
+
+    # --- READS ---
+    def series(self, tier, since, until=None):
+        """[(bucket start, punctuality %, average delay), ...] for buckets in [since, until)."""
+        rows = self._connection().execute(
+            f"SELECT bucket, observations, on_time, delay_sum FROM kpi_{tier} "
+            "WHERE bucket >= ? AND bucket < ? ORDER BY bucket",
+            (bucket_start(since, tier), time.time() + TIERS[tier] if until is None else until),
+        ).fetchall()
+        return [(bucket, 100.0 * on_time / n, delay_sum / n) for bucket, n, on_time, delay_sum in rows if n]
+
+    def totals(self, tier, since):
+        """(punctuality %, average delay) over every bucket from `since`, or None without data."""
+        n, on_time, delay_sum = self._connection().execute(
+            f"SELECT SUM(observations), SUM(on_time), SUM(delay_sum) FROM kpi_{tier} WHERE bucket >= ?",
+            (bucket_start(since, tier),),
+        ).fetchone()
+        return (100.0 * on_time / n, delay_sum / n) if n else None
+
+    def scan(self, tier, since, chunk=EXPORT_CHUNK):
+        """Buckets from `since` as [(bucket start, observations, punctuality %, average
+        delay), ...] lists of up to `chunk`, oldest first, for exports."""
+        conn = connect(self.path)
+        try:
+            after = bucket_start(since, tier) - 1
+            while True:
+                rows = conn.execute(
+                    f"SELECT bucket, observations, on_time, delay_sum FROM kpi_{tier} "
+                    "WHERE bucket > ? ORDER BY bucket LIMIT ?",
+                    (after, chunk),
+                ).fetchall()
+                if rows:
+                    yield [(bucket, n, 100.0 * on_time / n, delay_sum / n) for bucket, n, on_time, delay_sum in rows if n]
+                if len(rows) < chunk:
+                    return
+                after = rows[-1][0]
+        finally:
+            conn.close()
+
+    def period(self, period, now=None):
+        """Series for a "Select Time Period" option, read from its rollup tier."""
+        tier, span = PERIODS[period]
+        now = time.time() if now is None else now
+        return self.series(tier, now - span, now + TIERS[tier])
+
+
+# --- DOWNSAMPLING ---
+def lttb(xs, ys, threshold=MAX_POINTS):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps out of (xs, ys).
+
+    Always keeps the first and last point; in each of the threshold - 2 buckets between
+    them it keeps the point forming the largest triangle with the previously kept point
+    and the average of the next bucket, which preserves peaks and dips.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    kept = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for b in range(threshold - 2):
+        start = int(b * every) + 1
+        end = int((b + 1) * every) + 1
+        next_start, next_end = end, min(int((b + 2) * every) + 1, n)
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for i in range(start, end):
+            area = abs((ax - avg_x) * (ys[i] - ay) - (ax - xs[i]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = i, area
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return kept
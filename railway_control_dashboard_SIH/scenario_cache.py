@@ -0,0 +1,146 @@
+import hashlib
+import json
+import math
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from instrumentation import observe, register
+from network import BLOCKS, DWELL, HEADWAY, NODES, PUNCTUALITY_THRESHOLD, TRAIN_TYPES
+from simulation import SectionSimulator, run_scenario, scenario_bound
+
+CACHE_DIR = os.environ.get(
+    "RAILWAY_SCENARIO_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenario_cache")
+)
+CACHE_VERSION = 1          # bump when the simulator changes what a scenario produces
+MEMORY_ENTRIES = 128       # results kept in memory, least recently used evicted first
+DISK_ENTRIES = 4096        # results kept on disk
+CHECKPOINT_INTERVAL = 60.0 # simulated minutes between baseline checkpoints
+
+NETWORK_FINGERPRINT = hashlib.sha256(json.dumps(
+    [NODES, BLOCKS, TRAIN_TYPES, HEADWAY, DWELL, PUNCTUALITY_THRESHOLD, CACHE_VERSION], sort_keys=True
+).encode()).hexdigest()
+
+
+def scenario_key(timetable, scenario):
+    """Canonical hash of a Scenario Builder scenario and the network/timetable it runs on.
+
+    Numbers are compared as floats, so a delay of 15 and of 15.0 share an entry.
+    """
+    canonical = {
+        name: float(value) if isinstance(value, (int, float)) else value
+        for name, value in scenario.items()
+    }
+    text = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{NETWORK_FINGERPRINT}:{timetable.fingerprint()}:{text}".encode()).hexdigest()
+
+
+# --- SCENARIO CACHE ---
+# Three ways to a result, cheapest first: the in-memory LRU, the disk tier (which keeps
+# results across restarts), and simulating. Simulation does not start from midnight: the
+# undisturbed baseline is checkpointed every CHECKPOINT_INTERVAL minutes, and a scenario
+# continues from the last checkpoint before the time it first changes anything.
+class ScenarioCache:
+    def __init__(self, path=CACHE_DIR, memory_entries=MEMORY_ENTRIES, disk_entries=DISK_ENTRIES):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.memory = OrderedDict()
+        self.checkpoints = {}    # timetable fingerprint -> [(time, simulator), ...]
+        self.lock = threading.Lock()
+        self.hits = {"memory": 0, "disk": 0, "simulated": 0}
+        os.makedirs(path, exist_ok=True)
+        register(self)
+
+    def run(self, timetable, scenario):
+        """(SimulationResult, source) where source is "memory", "disk" or the resume time."""
+        started = time.perf_counter()
+        result, source = self._run(timetable, scenario)
+        tier = source if isinstance(source, str) else "simulated"
+        observe("railway_simulation_seconds", time.perf_counter() - started, source=tier)
+        return result, source
+
+    def _run(self, timetable, scenario):
+        key = scenario_key(timetable, scenario)
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits["memory"] += 1
+                return self.memory[key], "memory"
+        result = self._load(key)
+        if result is not None:
+            self._remember(key, result)
+            self.hits["disk"] += 1
+            return result, "disk"
+
+        resumed_at, sim = self._resume(timetable, scenario_bound(timetable, scenario))
+        result = run_scenario(timetable, scenario, resume=sim)
+        self._remember(key, result)
+        self._store(key, result)
+        self.hits["simulated"] += 1
+        return result, resumed_at
+
+    def metrics(self):
+        return [
+            ("railway_scenario_cache_requests_total", "counter", {"source": source}, count)
+            for source, count in self.hits.items()
+        ]
+
+    # --- CHECKPOINTS ---
+    def _resume(self, timetable, bound):
+        fingerprint = timetable.fingerprint()
+        with self.lock:
+            if fingerprint not in self.checkpoints:
+                self.checkpoints = {fingerprint: baseline_checkpoints(timetable)}
+            checkpoints = self.checkpoints[fingerprint]
+        resumed_at, sim = max((c for c in checkpoints if c[0] < bound), key=lambda c: c[0])
+        return resumed_at, sim.fork()
+
+    # --- MEMORY TIER ---
+    def _remember(self, key, result):
+        with self.lock:
+            self.memory[key] = result
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    # --- DISK TIER ---
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.pkl")
+
+    def _load(self, key):
+        try:
+            with open(self._file(key), "rb") as handle:
+                result = pickle.load(handle)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        os.utime(self._file(key))   # mtime doubles as the disk tier's recency
+        return result
+
+    def _store(self, key, result):
+        temp = f"{self._file(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, "wb") as handle:
+            pickle.dump(result, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, self._file(key))
+        files = [entry for entry in os.scandir(self.path) if entry.name.endswith(".pkl")]
+        if len(files) > self.disk_entries:
+            files.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in files[:len(files) - self.disk_entries]:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+def baseline_checkpoints(timetable, interval=CHECKPOINT_INTERVAL):
+    """Forks of the undisturbed run of `timetable`, one per `interval` simulated minutes."""
+    sim = SectionSimulator(timetable)
+    checkpoints = [(-math.inf, sim.fork())]
+    t = interval
+    while sim.events:
+        sim.run(until=t)
+        checkpoints.append((t, sim.fork()))
+        t += interval
+    return checkpoints
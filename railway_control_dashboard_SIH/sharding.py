@@ -0,0 +1,216 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+
+from conflicts import CONFLICT_LOOKAHEAD, ConflictDetector
+from feed import (
+    EMPTY_SNAPSHOT, EXIT, FEED_LOG, PUBLISH_INTERVAL, RECOMMENDATION_REFRESH, FeedIngest, FeedRecorder, source_from_env,
+)
+from instrumentation import register
+from network import DOWN, N_NODES, UP
+from optimizer import HoldOptimizer, HoldPlan
+from timetable_loader import working_timetable
+
+# --- DIVISION ---
+# Sections of the division in running order (Station B of one is Station A of the next),
+# from RAILWAY_SECTIONS="name,name,...". Unset means the single in-process section.
+# RAILWAY_FEED may contain "{section}", replaced by the section's position, so every
+# shard gets its own port or file.
+SECTIONS = [name.strip() for name in os.environ.get("RAILWAY_SECTIONS", "").split(",") if name.strip()]
+HANDOFF_TTL = CONFLICT_LOOKAHEAD * 60.0   # seconds a handed-over train is expected before it is dropped
+DEFAULT_BUDGET_MS = 300
+EMPTY_PLAN = HoldPlan(holds={}, objective=0.0, lower_bound=0.0, solve_ms=0.0, evaluations=0, warm_start=False, converged=True)
+
+
+def section_timetable(index):
+    """Working timetable of the section at `index` in SECTIONS."""
+    return working_timetable(index)
+
+
+def shard_log_name(index):
+    """Name the section's feed is recorded under (see feed.FeedRecorder)."""
+    return f"section{index}"
+
+
+@dataclass
+class ShardState:
+    snapshot: object
+    conflicts: list
+    plan: HoldPlan
+    last_message_ts: float
+    messages: int
+    errors: int
+    incoming: list       # [(ts, train, direction, delay, from section index), ...]
+
+
+# --- SHARD WORKER PROCESS ---
+# One per section: feed ingest, conflict detection and the hold optimizer run here, and
+# each new snapshot is published to the dashboard process with its conflicts and the
+# latest plan. A train leaving at a section boundary is passed on as a hand-off event;
+# the neighbour plans with that train's delay until its own feed reports it.
+def run_shard(index, spec, inbox, outbox):
+    timetable = section_timetable(index)
+
+    def on_events(events):
+        outbox.put(("events", index, events))
+        for ts, train, event, node, delay in events:
+            if event == EXIT and node in (0, N_NODES - 1):
+                # UP trains leave at Station B into the next section, DOWN trains at Station A.
+                direction = UP if node == N_NODES - 1 else DOWN
+                target = index + 1 if direction == UP else index - 1
+                outbox.put(("handoff", target, (ts, train, direction, delay, index)))
+
+    feed = FeedIngest(
+        source_from_env(timetable, spec=spec, seed=index), on_events=on_events,
+        recorder=FeedRecorder(shard_log_name(index)) if FEED_LOG else None,
+    ).start()
+    detector, optimizer = ConflictDetector(), HoldOptimizer()
+    incoming = {}
+    budget_ms, version, solved_at, plan = DEFAULT_BUDGET_MS, -1, float("-inf"), EMPTY_PLAN
+    while True:
+        try:
+            command = inbox.get(timeout=PUBLISH_INTERVAL)
+        except queue.Empty:
+            command = None
+        while command is not None:
+            kind, *args = command
+            if kind == "stop":
+                return
+            if kind == "handoff":
+                incoming[args[0][1]] = args[0]
+            elif kind == "reject":
+                optimizer.reject(*args)
+                solved_at = float("-inf")
+            elif kind == "budget":
+                budget_ms = args[0]
+            try:
+                command = inbox.get_nowait()
+            except queue.Empty:
+                command = None
+
+        snapshot = feed.latest
+        due = time.monotonic() - solved_at >= RECOMMENDATION_REFRESH
+        if snapshot.version == version and not due:
+            continue
+        now = time.time()
+        in_section = set(snapshot.ids)
+        for train in [t for t, handoff in incoming.items() if t in in_section or now - handoff[0] > HANDOFF_TTL]:
+            del incoming[train]
+        delays = {train: round(handoff[3], 1) for train, handoff in incoming.items()}
+        delays.update(snapshot.delays())
+        local = time.localtime(now)
+        minutes = local.tm_hour * 60 + local.tm_min
+        detector.sync(timetable, delays)
+        conflicts = detector.upcoming(minutes, CONFLICT_LOOKAHEAD)
+        if due:
+            plan = optimizer.solve(timetable, delays, minutes, conflicts, budget_ms=budget_ms)
+            solved_at = time.monotonic()
+        version = snapshot.version
+        outbox.put(("state", index, ShardState(
+            snapshot, conflicts, plan, feed.last_message_ts, feed.messages, feed.errors, sorted(incoming.values()),
+        )))
+
+
+# --- DASHBOARD SIDE ---
+class ShardFeed:
+    """A section worker as the Live page sees it: the FeedIngest attributes it reads, plus
+    the conflicts and hold plan the worker published with the snapshot."""
+
+    def __init__(self, name, index, inbox):
+        self.name = name
+        self.index = index
+        self.inbox = inbox
+        self.timetable = section_timetable(index)
+        self.latest = EMPTY_SNAPSHOT
+        self.conflicts = []
+        self.plan = EMPTY_PLAN
+        self.incoming = []
+        self.last_message_ts = 0.0
+        self.messages = 0
+        self.errors = 0
+        self.rejected = set()
+        self.budget_ms = DEFAULT_BUDGET_MS
+        self.process = None
+        register(self)
+
+    @property
+    def lag(self):
+        return time.time() - self.last_message_ts if self.last_message_ts else float("nan")
+
+    def apply(self, state):
+        self.conflicts = state.conflicts
+        self.plan = state.plan
+        self.incoming = state.incoming
+        self.last_message_ts = state.last_message_ts
+        self.messages = state.messages
+        self.errors = state.errors
+        self.latest = state.snapshot     # last, so readers of a new snapshot see its conflicts
+
+    def recommendation(self, budget_ms):
+        """Latest plan from the worker, which uses `budget_ms` from its next solve."""
+        if budget_ms != self.budget_ms:
+            self.budget_ms = budget_ms
+            self.inbox.put(("budget", budget_ms))
+        return self.plan
+
+    def reject(self, train, node):
+        self.rejected.add((train, node))
+        self.inbox.put(("reject", train, node))
+
+    def metrics(self):
+        labels = {"section": self.name}
+        return [
+            ("railway_feed_lag_seconds", "gauge", labels, self.lag),
+            ("railway_feed_messages_total", "counter", labels, self.messages),
+            ("railway_feed_errors_total", "counter", labels, self.errors),
+            ("railway_feed_snapshot_version", "gauge", labels, self.latest.version),
+            ("railway_shard_incoming_trains", "gauge", labels, len(self.incoming)),
+        ]
+
+
+class Division:
+    """Starts a worker process per section and routes what they publish.
+
+    States go to the matching ShardFeed, train events to `on_events` (as for FeedIngest)
+    and hand-offs to the neighbouring worker.
+    """
+
+    def __init__(self, sections=SECTIONS, on_events=None):
+        self.context = multiprocessing.get_context("spawn")   # workers must not inherit the app's threads
+        self.outbox = self.context.Queue()
+        self.on_events = on_events
+        self.shards = {name: ShardFeed(name, index, self.context.Queue()) for index, name in enumerate(sections)}
+        self.by_index = list(self.shards.values())
+        self.thread = None
+
+    def start(self):
+        spec = os.environ.get("RAILWAY_FEED", "sim")
+        for shard in self.by_index:
+            shard.process = self.context.Process(
+                target=run_shard, args=(shard.index, spec.format(section=shard.index), shard.inbox, self.outbox),
+                name=f"shard-{shard.index}", daemon=True,
+            )
+            shard.process.start()
+        self.thread = threading.Thread(target=self._route, name="division-router", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        for shard in self.by_index:
+            shard.inbox.put(("stop",))
+        for shard in self.by_index:
+            shard.process.join(timeout=5)
+
+    def _route(self):
+        while True:
+            kind, index, payload = self.outbox.get()
+            if kind == "state":
+                self.by_index[index].apply(payload)
+            elif kind == "events":
+                if self.on_events is not None:
+                    self.on_events(payload)
+            elif kind == "handoff" and 0 <= index < len(self.by_index):
+                self.by_index[index].inbox.put(("handoff", payload))
@@ -0,0 +1,286 @@
+import copy
+import heapq
+import math
+import operator
+from array import array
+from dataclasses import dataclass
+
+from network import (
+    BLOCKS, DWELL, HEADWAY, N_BLOCKS, N_NODES, ORIGINS, PRIORITY, PUNCTUALITY_THRESHOLD, TYPE_NAMES,
+    path_block, path_nodes, run_minutes, stops_at,
+)
+
+SCENARIO_TYPES = ["Introduce Train Delay", "Add Unscheduled Train", "Schedule Maintenance Block"]
+
+# --- EVENT KINDS ---
+READY, ARRIVE, WAKE = 0, 1, 2
+
+PATHS = [path_nodes(0), path_nodes(1)]
+# Looked up on every event: [direction][path position] -> block line, [type][block] -> run
+# minutes, [type][node] -> booked stop.
+LINE_OF = [[path_block(d, k) * 2 + d for k in range(N_BLOCKS)] for d in (0, 1)]
+RUN_MINUTES = [[run_minutes(code, block) for block in range(N_BLOCKS)] for code in range(len(TYPE_NAMES))]
+STOPS = [[stops_at(code, node) for node in range(N_NODES)] for code in range(len(TYPE_NAMES))]
+
+
+@dataclass
+class SimulationResult:
+    punctuality: float   # % of scored trains arriving within PUNCTUALITY_THRESHOLD
+    avg_delay: float     # mean arrival delay (minutes, early counts as 0) of scored trains
+    conflicts: int       # train/block pairs where another train cost a train time against its booking
+    final_delay: array   # arrival delay at the end of the section, per train
+    arr: array           # actual arrival times, same layout as Timetable.sched_arr
+    dep: array           # actual departure times, same layout as Timetable.sched_dep
+
+
+# --- DISCRETE-EVENT SECTION SIMULATOR ---
+# Trains move node -> block -> node. Each block has one line per direction worked under
+# automatic signalling: a train may enter a line HEADWAY after the previous train entered
+# it, and cannot leave it less than HEADWAY behind the train in front (no overtaking
+# inside a block). Trains waiting at a node for the same line stand on its loops and are
+# released by priority. Closed (maintenance) blocks are not entered until they reopen.
+# A train is ready to leave a node after its booked stop, and never before its booked
+# departure.
+class SectionSimulator:
+    def __init__(self, timetable, initial_delay=None, closures=None, holds=None, unscored=(),
+                 run_scale=1.0):
+        n = len(timetable)
+        self.tt = timetable
+        self.run_scale = run_scale
+        self.initial_delay = initial_delay or {}
+        self.closures = closures or {}     # block -> [(start, end), ...], both lines
+        self.holds = holds or {}           # (train, node) -> extra minutes at that node
+        self.unscored = set(unscored)
+
+        # Train state
+        self.pos = array("b", [0]) * n
+        self.arr = array("d", [math.nan]) * (n * N_NODES)
+        self.dep = array("d", [math.nan]) * (n * N_NODES)
+        self.held = array("b", [0]) * (n * N_NODES)
+
+        # Block-line state (line = block * 2 + direction)
+        self.last_entry = array("d", [-math.inf]) * (N_BLOCKS * 2)
+        self.last_exit = array("d", [-math.inf]) * (N_BLOCKS * 2)
+        self.wake_at = array("d", [math.nan]) * (N_BLOCKS * 2)
+        self.queues = [[] for _ in range(N_BLOCKS * 2)]
+
+        self.conflicts = 0
+        self.now = 0.0
+        self.events = []
+        self.seq = 0
+        for i in range(n):
+            start = timetable.sched_dep[i * N_NODES] + self.initial_delay.get(i, 0.0)
+            self.arr[i * N_NODES] = start
+            self._push(start + self.holds.get((i, PATHS[timetable.dirs[i]][0]), 0.0), READY, i)
+
+    def _push(self, t, kind, x):
+        self.seq += 1
+        heapq.heappush(self.events, (t, self.seq, kind, x))
+
+    # --- CHECKPOINTS ---
+    # A run can be forked at any point and the copy continued with a perturbation, which
+    # gives the same result as simulating the perturbed inputs from the start as long as
+    # nothing before the fork depended on them (see the `*_bound` helpers below).
+    def fork(self):
+        clone = copy.copy(self)
+        for name in ("pos", "arr", "dep", "held", "last_entry", "last_exit", "wake_at"):
+            setattr(clone, name, getattr(self, name)[:])
+        clone.queues = [list(queue) for queue in self.queues]
+        clone.events = list(self.events)
+        clone.initial_delay = dict(self.initial_delay)
+        clone.closures = {block: list(spans) for block, spans in self.closures.items()}
+        clone.holds = dict(self.holds)
+        clone.unscored = set(self.unscored)
+        return clone
+
+    def state_key(self):
+        """Everything the rest of a run depends on besides closures and holds still ahead.
+        Two runs with equal keys at the same simulated time, and the same closures and
+        holds to come, finish identically from there whatever they did before."""
+        events = [(t, kind, x) for t, _, kind, x in sorted(self.events)]
+        queues = [[(priority, t, i) for priority, t, _, i in sorted(queue)] for queue in self.queues]
+        held = bytes(map(self.held.__getitem__, map(operator.add, range(0, len(self.pos) * N_NODES, N_NODES), self.pos)))
+        return (
+            self.pos.tobytes(), held, self.last_entry.tobytes(), self.last_exit.tobytes(), self.wake_at.tobytes(),
+            events, queues,
+        )
+
+    def delay_train(self, i, minutes):
+        """Make train row `i` leave its origin `minutes` later. It must not have left yet."""
+        waiting = [k for k, event in enumerate(self.events) if event[2] == READY and event[3] == i]
+        if self.pos[i] != 0 or not waiting:
+            raise ValueError(f"Train {self.tt.ids[i]} has already left its origin.")
+        t, seq, kind, x = self.events[waiting[0]]
+        # Same sequence number as before, so ties resolve as they would from the start.
+        self.events[waiting[0]] = (t + minutes, seq, kind, x)
+        heapq.heapify(self.events)
+        self.arr[i * N_NODES] += minutes
+        self.initial_delay[i] = self.initial_delay.get(i, 0.0) + minutes
+
+    def close_block(self, block, start, end):
+        self.closures.setdefault(block, []).append((start, end))
+
+    def add_train(self, timetable):
+        """Switch to `timetable`, which has one more train appended, and start that train."""
+        i = len(self.tt)
+        self.tt = timetable
+        self.pos.append(0)
+        for name in ("arr", "dep"):
+            getattr(self, name).extend([math.nan] * N_NODES)
+        self.held.extend([0] * N_NODES)
+        start = timetable.sched_dep[i * N_NODES] + self.initial_delay.get(i, 0.0)
+        self.arr[i * N_NODES] = start
+        # Ordered like the trains queued by the constructor: before anything pushed by run().
+        heapq.heappush(self.events, (start + self.holds.get((i, PATHS[timetable.dirs[i]][0]), 0.0), i + 0.5, READY, i))
+
+    def run(self, until=math.inf):
+        events, t = self.events, self.now
+        pop, ready, arrive, dispatch, wake_at = heapq.heappop, self._ready, self._arrive, self._dispatch, self.wake_at
+        while events and events[0][0] <= until:
+            t, _, kind, x = pop(events)
+            if kind == READY:
+                ready(x, t)
+            elif kind == ARRIVE:
+                arrive(x, t)
+            else:
+                wake_at[x] = math.nan
+                dispatch(x, t)
+        self.now = t
+        return self
+
+    # --- EVENT HANDLERS ---
+    def _conflict(self, i):
+        slot = i * N_NODES + self.pos[i]
+        if not self.held[slot]:
+            self.held[slot] = 1
+            self.conflicts += 1
+
+    def _ready(self, i, t):
+        line = LINE_OF[self.tt.dirs[i]][self.pos[i]]
+        queue = self.queues[line]
+        if queue or t < self.last_entry[line] + HEADWAY:
+            self._conflict(i)
+        self.seq += 1
+        heapq.heappush(queue, (-PRIORITY[self.tt.types[i]], t, self.seq, i))
+        self._dispatch(line, t)
+
+    def _dispatch(self, line, t):
+        queue = self.queues[line]
+        if not queue:
+            return
+        free = self.last_entry[line] + HEADWAY
+        if t < free:
+            self._wake(line, free)
+            return
+        i = queue[0][3]
+        block = line // 2
+        run = RUN_MINUTES[self.tt.types[i]][block] * self.run_scale
+        for start, end in self.closures.get(block, ()):
+            if start < t + run and end > t:
+                self._wake(line, end)
+                return
+        heapq.heappop(queue)
+
+        slot = i * N_NODES + self.pos[i]
+        arrival = t + run
+        if arrival < self.last_exit[line] + HEADWAY:
+            arrival = self.last_exit[line] + HEADWAY  # caught up with the train in front
+            if arrival > self.tt.sched_arr[slot + 1]:
+                self._conflict(i)
+        self.last_entry[line] = t
+        self.last_exit[line] = arrival
+        self.dep[slot] = t
+        self._push(arrival, ARRIVE, i)
+        if queue:
+            self._wake(line, t + HEADWAY)
+
+    def _wake(self, line, t):
+        if self.wake_at[line] != t:
+            self.wake_at[line] = t
+            self._push(t, WAKE, line)
+
+    def _arrive(self, i, t):
+        d = self.tt.dirs[i]
+        k = self.pos[i] + 1
+        self.pos[i] = k
+        base = i * N_NODES + k
+        self.arr[base] = t
+        if k == N_NODES - 1:
+            self.dep[base] = t
+            return
+        node = PATHS[d][k]
+        # Trains never leave a timing point before their booked departure.
+        ready = max(t + DWELL if STOPS[self.tt.types[i]][node] else t, self.tt.sched_dep[base])
+        self._push(ready + self.holds.get((i, node), 0.0), READY, i)
+
+    # --- RESULTS ---
+    def result(self):
+        tt = self.tt
+        last = N_NODES - 1
+        final_delay = array("d", (
+            self.arr[i * N_NODES + last] - tt.sched_arr[i * N_NODES + last] for i in range(len(tt))
+        ))
+        scored = [final_delay[i] for i in range(len(tt)) if i not in self.unscored]
+        on_time = sum(1 for delay in scored if delay <= PUNCTUALITY_THRESHOLD)
+        return SimulationResult(
+            punctuality=100.0 * on_time / len(scored) if scored else 100.0,
+            avg_delay=sum(max(delay, 0.0) for delay in scored) / len(scored) if scored else 0.0,
+            conflicts=self.conflicts,
+            final_delay=final_delay,
+            arr=self.arr,
+            dep=self.dep,
+        )
+
+
+# --- SCENARIOS ---
+def run_baseline(timetable, disturbances=None):
+    return SectionSimulator(timetable, initial_delay=disturbances).run().result()
+
+
+def run_scenario(timetable, scenario, disturbances=None, resume=None):
+    """Simulate one Scenario Builder scenario (a dict with a "type" from SCENARIO_TYPES).
+
+    `disturbances` optionally adds background origin delays ({train row: minutes}).
+    `resume` optionally continues a fork of an undisturbed baseline run of `timetable`
+    taken before scenario_bound(), instead of simulating from midnight.
+    """
+    kind = scenario["type"]
+    if kind not in SCENARIO_TYPES:
+        raise ValueError(f"Unknown scenario type: {kind}")
+    sim = resume or SectionSimulator(timetable, initial_delay=disturbances)
+    if kind == "Introduce Train Delay":
+        sim.delay_train(timetable.row(scenario["train_id"]), float(scenario["delay"]))
+    elif kind == "Add Unscheduled Train":
+        sim.add_train(scenario_timetable(timetable, scenario))
+        sim.unscored.add(len(timetable))
+    else:
+        start = float(scenario["start"])
+        sim.close_block(BLOCKS.index(scenario["section"]), start, start + 60.0 * scenario["duration"])
+    return sim.run().result()
+
+
+def scenario_timetable(timetable, scenario):
+    """The timetable a scenario runs on: with the extra train for "Add Unscheduled Train"."""
+    if scenario["type"] == "Add Unscheduled Train":
+        return timetable.with_train(
+            "UNSCHEDULED", scenario["train_type"], ORIGINS[scenario["origin"]], float(scenario["departure"])
+        )
+    return timetable
+
+
+def scenario_bound(timetable, scenario):
+    """Simulated time a baseline run must not have reached for run_scenario(resume=...).
+
+    Everything the baseline did up to then is unaffected by the scenario: the delayed
+    train had not left, the extra train was not due, and no train could yet have entered
+    the closed block and still be in it when the closure starts.
+    """
+    kind = scenario["type"]
+    if kind == "Introduce Train Delay":
+        return timetable.sched_dep[timetable.row(scenario["train_id"]) * N_NODES]
+    if kind == "Add Unscheduled Train":
+        return float(scenario["departure"])
+    if kind == "Schedule Maintenance Block":
+        block = BLOCKS.index(scenario["section"])
+        return float(scenario["start"]) - max(run_minutes(code, block) for code in range(len(TYPE_NAMES)))
+    raise ValueError(f"Unknown scenario type: {kind}")
@@ -0,0 +1,166 @@
+import numpy as np
+import plotly.graph_objects as go
+
+from network import N_NODES, NODES, TYPE_NAMES, UP, fmt_clock, path_nodes
+
+# --- DIAGRAM SETTINGS ---
+WINDOWS = {"2 h": 120, "6 h": 360, "12 h": 720, "24 h": 1440}   # time axis span, minutes
+PLOT_WIDTH_PX = 1200     # resolution the time axis is decimated to
+CLASS_COLORS = {
+    "Rajdhani": "#ff4b4b",
+    "Express": "#ffa421",
+    "Local": "#21c354",
+    "Freight": "#1c83e1",
+    "Maintenance": "#a3a8b8",
+}
+PATH_KM = np.array([[NODES[node]["km"] for node in path_nodes(d)] for d in (0, 1)])
+
+
+def path_points(arr, dep, dirs):
+    """Vertices of every train's line: (time, km) at arrival and departure of each node.
+
+    arr/dep are (n, N_NODES) arrays in running order; returns two (n, 2 * N_NODES) arrays.
+    """
+    n = len(dirs)
+    times = np.empty((n, 2 * N_NODES))
+    times[:, 0::2] = arr
+    times[:, 1::2] = dep
+    kms = np.repeat(PATH_KM[np.asarray(dirs, dtype=np.intp)], 2, axis=1)
+    return times, kms
+
+
+def decimate(times, resolution):
+    """Mask of the vertices worth drawing at `resolution` minutes per pixel.
+
+    A departure vertex only adds a horizontal dwell segment; it is dropped when the dwell
+    is shorter than a pixel, which at full-day zoom halves the points sent to the browser.
+    """
+    keep = np.ones(times.shape, dtype=bool)
+    keep[:, 1::2] = times[:, 1::2] - times[:, 0::2] >= max(resolution, 1e-9)
+    keep[:, -1] = False     # the final departure is the final arrival again
+    return keep & ~np.isnan(times)
+
+
+def _class_trace(name, times, kms, keep, ids):
+    # One line per train, separated by NaN gaps, all trains of the class in a single trace.
+    counts = keep.sum(axis=1)
+    rows = np.repeat(np.arange(len(ids)), counts + 1)
+    x = np.full(len(rows), np.nan)
+    y = np.full(len(rows), np.nan)
+    ends = np.cumsum(counts + 1) - 1
+    filled = np.ones(len(rows), dtype=bool)
+    filled[ends] = False
+    x[filled] = times[keep]
+    y[filled] = kms[keep]
+    return go.Scattergl(
+        x=x, y=y, mode="lines", name=name, text=np.asarray(ids, dtype=object)[rows],
+        line=dict(color=CLASS_COLORS[name], width=1.5), connectgaps=False,
+        hovertemplate="Train %{text}<br>%{y:.0f} km<extra>" + name + "</extra>",
+    )
+
+
+def string_diagram(timetable, arr, dep, window, positions=None, conflicts=None, now=None, width_px=PLOT_WIDTH_PX):
+    """Time-distance diagram of the trains running in `window` = (start, end) minutes.
+
+    arr/dep: arrival/departure times laid out like Timetable.sched_arr (e.g. a
+    SimulationResult). positions: optional (minutes, km, train ids) markers for trains
+    in the section; conflicts: optional Conflict list to mark.
+    """
+    start, end = window
+    n = len(timetable)
+    arr = np.asarray(arr, dtype=float).reshape(n, N_NODES)
+    dep = np.asarray(dep, dtype=float).reshape(n, N_NODES)
+    types = np.asarray(timetable.types, dtype=np.intp)
+    dirs = np.asarray(timetable.dirs, dtype=np.intp)
+    ids = np.asarray(timetable.ids, dtype=object)
+
+    visible = (np.nanmin(arr, axis=1) < end) & (np.nanmax(arr, axis=1) > start)
+    times, kms = path_points(arr[visible], dep[visible], dirs[visible])
+    keep = decimate(times, (end - start) / width_px)
+
+    fig = go.Figure()
+    for code, name in enumerate(TYPE_NAMES):
+        rows = types[visible] == code
+        if rows.any():
+            fig.add_trace(_class_trace(name, times[rows], kms[rows], keep[rows], ids[visible][rows]))
+
+    if positions is not None:
+        minutes, km, trains = positions
+        fig.add_trace(go.Scattergl(
+            x=np.full(len(km), minutes), y=np.asarray(km), mode="markers", name="Trains now",
+            text=list(trains), marker=dict(color="#ffffff", size=7, line=dict(color="#0E1117", width=1)),
+            hovertemplate="Train %{text}<br>%{y:.1f} km<extra></extra>",
+        ))
+    if conflicts:
+        fig.add_trace(go.Scattergl(
+            x=[c.time for c in conflicts], y=[block_entry_km(c.line) for c in conflicts], mode="markers",
+            name="Projected conflicts", text=[f"{c.behind} behind {c.ahead}, {c.block}" for c in conflicts],
+            marker=dict(symbol="x", color="#ff2b2b", size=11),
+            hovertemplate="%{text}<extra>Conflict</extra>",
+        ))
+    if now is not None:
+        fig.add_vline(x=now, line=dict(color="#fafafa", width=1, dash="dot"))
+
+    step = 30 if end - start <= 240 else 60 if end - start <= 720 else 120
+    ticks = list(range(int(start // step * step), int(end) + step, step))
+    fig.update_layout(
+        template="plotly_dark", height=420, margin=dict(l=10, r=10, t=30, b=10),
+        legend=dict(orientation="h", y=1.08), uirevision="string-diagram",
+        xaxis=dict(range=[start, end], tickvals=ticks, ticktext=[fmt_clock(t) for t in ticks], title=None),
+        yaxis=dict(
+            tickvals=[node["km"] for node in NODES], ticktext=[node["label"] for node in NODES],
+            range=[NODES[-1]["km"] + 2, NODES[0]["km"] - 2], title=None,
+        ),
+    )
+    return fig
+
+
+def block_entry_km(line):
+    block, d = divmod(line, 2)
+    return NODES[block if d == UP else block + 1]["km"]
+
+
+def live_diagram(timetable, snapshot, now, span, conflicts=None, prediction=None):
+    """Diagram around `now`: booked paths shifted by each train's current delay, plus positions.
+
+    With an eta.Prediction, the paths ahead of each train are its predicted times instead.
+    """
+    shift = np.zeros(len(timetable))
+    for train, delay in snapshot.delays().items():
+        if train in timetable.index:
+            shift[timetable.index[train]] = delay
+    arr = np.asarray(timetable.sched_arr).reshape(-1, N_NODES) + shift[:, None]
+    dep = np.asarray(timetable.sched_dep).reshape(-1, N_NODES) + shift[:, None]
+    if prediction is not None:
+        arr = np.where(np.isnan(prediction.arr), arr, prediction.arr)
+        dep = np.where(np.isnan(prediction.dep), dep, prediction.dep)
+    return string_diagram(
+        timetable, arr, dep, diagram_window(now, span),
+        positions=(now, snapshot.km, snapshot.ids), conflicts=conflicts, now=now,
+    )
+
+
+def diagram_window(center, span, lead=0.25):
+    """(start, end) of a `span`-minute window with `center` a quarter of the way in."""
+    start = min(max(center - span * lead, 0.0), max(24 * 60 - span, 0.0))
+    return start, start + span
+
+
+# --- MAINTENANCE WINDOWS ---
+def window_heatmap(ranking, step):
+    """Added delay of every candidate block start (see maintenance.rank_windows): one row
+    per hour, one column per `step` minutes within it."""
+    per_hour = int(60 // step)
+    z = np.full((24, per_hour), np.nan)
+    for row in ranking:
+        z[int(row["start"] // 60), int(row["start"] % 60 // step)] = row["added_delay"]
+    fig = go.Figure(go.Heatmap(
+        z=z, x=[f":{int(k * step):02d}" for k in range(per_hour)], y=[f"{hour:02d}" for hour in range(24)],
+        colorscale="RdYlGn_r", colorbar=dict(title="train-min"), xgap=2, ygap=2,
+        hovertemplate="Start %{y}%{x}<br>+%{z:.0f} train-min of delay<extra></extra>",
+    ))
+    fig.update_layout(
+        template="plotly_dark", height=520, margin=dict(l=10, r=10, t=30, b=10),
+        xaxis=dict(title="Start minute", side="top"), yaxis=dict(title="Start hour", autorange="reversed"),
+    )
+    return fig
@@ -0,0 +1,117 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from simulation import run_baseline, run_scenario
+
+# --- STOCHASTIC MODEL ---
+# Every replication draws its own background disturbance on top of the scenario: each
+# train is late off its origin with probability DISTURBANCE_SHARE, by an exponentially
+# distributed amount. Scenario and disturbance-only runs share the same draw so the
+# difference between them is the scenario's own impact.
+DISTURBANCE_SHARE = 0.1
+DISTURBANCE_MEAN = 5.0  # minutes
+
+
+def sample_replications(scenario, replications, seed=0, delay_range=None, sections=None, departure_window=0):
+    """Expand a Scenario Builder scenario into `replications` (scenario, seed) pairs.
+
+    delay_range: (min, max) minutes for "Introduce Train Delay", sampled from a triangular
+    distribution that favours short delays. sections: track sections for
+    "Schedule Maintenance Block", cycled so every option gets an equal share.
+    departure_window: minutes after the chosen departure an unscheduled train may leave.
+    """
+    rng = random.Random(seed)
+    runs = []
+    for r in range(replications):
+        sampled = dict(scenario)
+        if delay_range and scenario["type"] == "Introduce Train Delay":
+            low, high = delay_range
+            sampled["delay"] = round(rng.triangular(low, high, low), 1)
+        if sections and scenario["type"] == "Schedule Maintenance Block":
+            sampled["section"] = sections[r % len(sections)]
+        if departure_window and scenario["type"] == "Add Unscheduled Train":
+            sampled["departure"] = scenario["departure"] + rng.uniform(0, departure_window)
+        runs.append((sampled, rng.randrange(2 ** 32)))
+    return runs
+
+
+def _disturbances(n_trains, seed):
+    rng = random.Random(seed)
+    return {
+        i: rng.expovariate(1.0 / DISTURBANCE_MEAN)
+        for i in range(n_trains) if rng.random() < DISTURBANCE_SHARE
+    }
+
+
+# --- WORKER PROCESSES ---
+_TIMETABLE = None
+
+
+def _init_worker(timetable):
+    global _TIMETABLE
+    _TIMETABLE = timetable
+
+
+def _run_batch(batch):
+    rows = []
+    for scenario, seed in batch:
+        disturbances = _disturbances(len(_TIMETABLE), seed)
+        reference = run_baseline(_TIMETABLE, disturbances)
+        result = run_scenario(_TIMETABLE, scenario, disturbances)
+        rows.append({
+            "scenario": scenario,
+            "punctuality": result.punctuality,
+            "avg_delay": result.avg_delay,
+            "added_delay": result.avg_delay - reference.avg_delay,
+            "new_conflicts": result.conflicts - reference.conflicts,
+        })
+    return rows
+
+
+def run_sweep(timetable, runs, workers=None):
+    """Fan replications out over a process pool; yields lists of rows as batches finish."""
+    workers = workers or os.cpu_count() or 1
+    # Small batches keep the first results coming back quickly; enough of them keeps
+    # every worker busy until the end.
+    batch_size = max(1, min(25, len(runs) // (workers * 8)))
+    batches = [runs[i:i + batch_size] for i in range(0, len(runs), batch_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(timetable,)) as pool:
+        futures = [pool.submit(_run_batch, batch) for batch in batches]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+# --- SUMMARY STATISTICS ---
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    pos = (len(values) - 1) * q / 100.0
+    lower = int(pos)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (pos - lower)
+
+
+def summarize(rows):
+    delays = [row["avg_delay"] for row in rows]
+    return {
+        "replications": len(rows),
+        "p50_delay": percentile(delays, 50),
+        "p90_delay": percentile(delays, 90),
+        "p90_added_delay": percentile([row["added_delay"] for row in rows], 90),
+        "conflict_probability": sum(1 for row in rows if row["new_conflicts"] > 0) / len(rows) if rows else 0.0,
+        "punctuality": sum(row["punctuality"] for row in rows) / len(rows) if rows else 0.0,
+    }
+
+
+def summarize_by(rows, key):
+    """Per-option summaries, e.g. one per track section of a maintenance sweep."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(row["scenario"][key], []).append(row)
+    return {option: summarize(group) for option, group in groups.items()}
@@ -0,0 +1,143 @@
+import hashlib
+import random
+from array import array
+
+from network import (
+    DOWN, DWELL, N_BLOCKS, N_NODES, RECOVERY_ALLOWANCE, TYPE_CODES, TYPE_NAMES, UP,
+    path_block, path_nodes, run_minutes, stops_at,
+)
+from simulation import SectionSimulator
+
+
+# --- TIMETABLE MODEL ---
+# Column-oriented: one entry per train in `ids`/`types`/`dirs`, and the booked times in
+# flat arrays of n_trains * N_NODES laid out in each train's running order
+# (position k of train i lives at i * N_NODES + k).
+class Timetable:
+    def __init__(self, ids, types, dirs, sched_arr, sched_dep):
+        self.ids = list(ids)
+        self.types = array("b", types)
+        self.dirs = array("b", dirs)
+        self.sched_arr = array("d", sched_arr)
+        self.sched_dep = array("d", sched_dep)
+        self.index = {train_id: i for i, train_id in enumerate(self.ids)}
+        self.image = None
+        self._fingerprint = None
+
+    @classmethod
+    def mapped(cls, image, ids, types, dirs, sched_arr, sched_dep):
+        """Timetable over the columns of a memory-mapped image (see timetable_loader), used
+        in place rather than copied."""
+        timetable = cls.__new__(cls)
+        timetable.ids = ids
+        timetable.types, timetable.dirs = types, dirs
+        timetable.sched_arr, timetable.sched_dep = sched_arr, sched_dep
+        timetable.index = {train_id: i for i, train_id in enumerate(ids)}
+        timetable.image = image
+        timetable._fingerprint = None
+        return timetable
+
+    def __reduce_ex__(self, protocol):
+        # Sent to a worker process, a mapped timetable maps the same image there.
+        if self.image is not None:
+            from timetable_loader import open_image
+            return open_image, (self.image,)
+        return super().__reduce_ex__(protocol)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, train_id):
+        if train_id not in self.index:
+            raise ValueError(f"Train {train_id} is not in the timetable.")
+        return self.index[train_id]
+
+    def fingerprint(self):
+        """Content hash of the whole timetable, for keying results computed from it."""
+        if self._fingerprint is None:
+            digest = hashlib.sha256("\n".join(self.ids).encode())
+            for column in (self.types, self.dirs, self.sched_arr, self.sched_dep):
+                digest.update(column.tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def type_name(self, i):
+        return TYPE_NAMES[self.types[i]]
+
+    def with_train(self, train_id, type_name, direction, departure):
+        """Copy of the timetable with one extra (e.g. unscheduled) train appended."""
+        arr, dep = booked_times(TYPE_CODES[type_name], direction, departure)
+        return Timetable(
+            self.ids + [train_id], list(self.types) + [TYPE_CODES[type_name]],
+            list(self.dirs) + [direction],
+            list(self.sched_arr) + arr, list(self.sched_dep) + dep,
+        )
+
+    def subset(self, rows):
+        """Copy holding only the given train rows, in that order."""
+        return Timetable(
+            [self.ids[i] for i in rows], [self.types[i] for i in rows], [self.dirs[i] for i in rows],
+            [t for i in rows for t in self.sched_arr[i * N_NODES:(i + 1) * N_NODES]],
+            [t for i in rows for t in self.sched_dep[i * N_NODES:(i + 1) * N_NODES]],
+        )
+
+
+def booked_times(type_code, direction, departure):
+    """Booked arrival/departure at every node of the path for a train leaving at `departure`."""
+    arr, dep = [], []
+    t = departure
+    nodes = path_nodes(direction)
+    for k, node in enumerate(nodes):
+        arr.append(t)
+        if 0 < k < N_NODES - 1 and stops_at(type_code, node):
+            t += DWELL
+        dep.append(t)
+        if k < N_BLOCKS:
+            t += run_minutes(type_code, path_block(direction, k)) * (1.0 + RECOVERY_ALLOWANCE)
+    return arr, dep
+
+
+# --- SYNTHETIC TIMETABLE ---
+# Stand-in for a real working timetable: the five trains shown on the dashboard plus
+# randomly generated traffic spread over the day.
+KNOWN_TRAINS = [
+    ("12301", "Rajdhani", UP, 16 * 60 + 5),
+    ("45678", "Freight", UP, 15 * 60 + 50),
+    ("20825", "Express", DOWN, 15 * 60 + 40),
+    ("12859", "Express", UP, 17 * 60 + 20),
+    ("54321", "Local", DOWN, 16 * 60 + 15),
+]
+TYPE_MIX = {"Rajdhani": 0.1, "Express": 0.35, "Local": 0.25, "Freight": 0.3}
+
+
+def synthetic_timetable(n_trains=200, seed=7):
+    rng = random.Random(seed)
+    rows = list(KNOWN_TRAINS)
+    used = {train_id for train_id, *_ in rows}
+    while len(rows) < n_trains:
+        train_id = str(rng.randint(10000, 99999))
+        if train_id in used:
+            continue
+        used.add(train_id)
+        type_name = rng.choices(list(TYPE_MIX), weights=list(TYPE_MIX.values()))[0]
+        rows.append((train_id, type_name, rng.choice([UP, DOWN]), rng.uniform(0, 24 * 60 - 90)))
+
+    ids, types, dirs, sched_arr, sched_dep = [], [], [], [], []
+    for train_id, type_name, direction, departure in rows:
+        arr, dep = booked_times(TYPE_CODES[type_name], direction, round(departure))
+        ids.append(train_id)
+        types.append(TYPE_CODES[type_name])
+        dirs.append(direction)
+        sched_arr.extend(arr)
+        sched_dep.extend(dep)
+    return plan_timetable(Timetable(ids, types, dirs, sched_arr, sched_dep))
+
+
+def plan_timetable(timetable):
+    """Book a conflict-free plan: simulate on padded run times and adopt the result.
+
+    Precedence waits the simulator needs to resolve clashes between the requested paths
+    become booked waits at loops, the way a timetable planner would book them.
+    """
+    plan = SectionSimulator(timetable, run_scale=1.0 + RECOVERY_ALLOWANCE).run()
+    return Timetable(timetable.ids, timetable.types, timetable.dirs, plan.arr, plan.dep)
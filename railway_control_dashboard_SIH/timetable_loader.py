@@ -0,0 +1,246 @@
+import csv
+import functools
+import hashlib
+import json
+import mmap
+import os
+from array import array
+
+from network import (
+    DOWN, N_NODES, NODE_NAMES, NODES, RECOVERY_ALLOWANCE, TYPE_CODES, TYPE_NAMES, UP,
+    path_block, path_nodes, run_minutes,
+)
+from timetable import Timetable, synthetic_timetable
+
+# --- WORKING TIMETABLE FILES ---
+# A working timetable is imported from CSV or Parquet with one row per train per timing
+# point, in any order:
+#
+#     train_id,train_type,station,arrival,departure
+#     12301,Rajdhani,Station A,,16:05
+#     12301,Rajdhani,Raipur,16:41,16:43
+#
+# Times are "HH:MM" (hours past 24 for trains running after midnight) or, in Parquet,
+# integer minutes after midnight. Stations are NODES names or labels. A train's direction
+# follows from its first and last timing points; timing points it has no row for are
+# filled in by km between its booked ones, or at padded run time beyond them. The file is
+# taken as already planned, so unlike the synthetic timetable it is not re-planned.
+#
+# The first load compiles the file into a columnar image (train type and direction as
+# int8 codes, times as int32 minutes, ids fixed width) under RAILWAY_TIMETABLE_CACHE.
+# Every later load, in any process, memory-maps that image read-only, so the app, the
+# section workers and the sweep workers share one copy of the columns in the page cache.
+TIMETABLE_FILE = os.environ.get("RAILWAY_TIMETABLE", "")   # may contain "{section}", like RAILWAY_FEED
+TIMETABLE_CACHE = os.environ.get(
+    "RAILWAY_TIMETABLE_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "timetable_cache")
+)
+COLUMNS = ("train_id", "train_type", "station", "arrival", "departure")
+STATION_CODES = {**{node["label"]: k for k, node in enumerate(NODES)}, **{node["name"]: k for k, node in enumerate(NODES)}}
+MISSING = -(2 ** 31)
+MAGIC = b"RTTC0001"
+
+
+def working_timetable(section=0):
+    """Timetable of the section at `section` in the division: from RAILWAY_TIMETABLE if
+    set, else the synthetic one."""
+    if not TIMETABLE_FILE:
+        return synthetic_timetable(seed=7 + section)
+    return load_timetable_file(TIMETABLE_FILE.format(section=section))
+
+
+def load_timetable_file(path, cache_dir=TIMETABLE_CACHE):
+    """Timetable from a CSV or Parquet working timetable, compiled once and memory-mapped."""
+    stat = os.stat(path)
+    source = os.path.abspath(path)
+    stamp = [source, stat.st_size, stat.st_mtime_ns]
+    name = os.path.splitext(os.path.basename(path))[0]
+    image = os.path.join(cache_dir, f"{name}-{hashlib.sha1(source.encode()).hexdigest()[:12]}.ttc")
+    try:
+        return open_image(image, stamp)
+    except (OSError, ValueError):   # not compiled yet, or compiled from an older version of the file
+        pass
+    ids, types, dirs, sched_arr, sched_dep = read_timetable(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    write_image(image, stamp, ids, types, dirs, sched_arr, sched_dep)
+    return open_image(image, stamp)
+
+
+def read_timetable(path):
+    """Columns (ids, types, dirs, sched_arr, sched_dep) of a working timetable file."""
+    rows = _parquet_rows(path) if path.endswith((".parquet", ".pq")) else _csv_rows(path)
+    return _running_order(*_collect(rows))
+
+
+@functools.lru_cache(maxsize=4096)   # a day has 1440 distinct clock times, files repeat them
+def parse_clock(text):
+    """'16:45' -> 1005 minutes after midnight; blank -> None."""
+    text = text.strip() if text else ""
+    if not text:
+        return None
+    hours, _, minutes = text.partition(":")
+    return int(hours) * 60 + int(minutes.partition(":")[0])
+
+
+# --- READERS ---
+# Both yield (train_id, type code, station code, arrival, departure) with the times in
+# minutes or None.
+def _csv_rows(path):
+    with open(path, newline="") as handle:
+        reader = csv.reader(handle)
+        header = [name.strip() for name in next(reader, [])]
+        if not set(COLUMNS) <= set(header):
+            raise ValueError(f"{path}: expected columns {', '.join(COLUMNS)}.")
+        train, type_name, station, arrival, departure = (header.index(name) for name in COLUMNS)
+        for line, row in enumerate(reader, 2):
+            try:
+                yield (
+                    row[train].strip(), TYPE_CODES[row[type_name].strip()], STATION_CODES[row[station].strip()],
+                    parse_clock(row[arrival]), parse_clock(row[departure]),
+                )
+            except (IndexError, KeyError, ValueError):
+                raise ValueError(f"{path}, line {line}: cannot read {','.join(row)!r}.") from None
+
+
+def _parquet_rows(path):
+    import pyarrow.parquet as pq   # only needed for Parquet timetables
+    import pyarrow.types
+
+    table = pq.read_table(path, columns=list(COLUMNS), read_dictionary=["train_type", "station"])
+
+    def codes(name, lookup):
+        # Dictionary-encoded: each distinct name is looked up once, then rows map by index.
+        column = table.column(name).combine_chunks()
+        names = column.dictionary.to_pylist()
+        unknown = [value for value in names if value not in lookup]
+        if unknown:
+            raise ValueError(f"{path}: unknown {name} {', '.join(map(str, unknown))}.")
+        mapping = [lookup[value] for value in names]
+        return [mapping[k] if k is not None else None for k in column.indices.to_pylist()]
+
+    def minutes(name):
+        values = table.column(name).to_pylist()
+        return values if pyarrow.types.is_integer(table.schema.field(name).type) else [parse_clock(v) for v in values]
+
+    ids = [str(value) for value in table.column("train_id").to_pylist()]
+    return zip(ids, codes("train_type", TYPE_CODES), codes("station", STATION_CODES), minutes("arrival"), minutes("departure"))
+
+
+# --- COLUMN BUILDING ---
+def _collect(rows):
+    """Booked times per train, indexed by node from Station A; MISSING where the file has none."""
+    index, types = {}, array("b")
+    arr, dep = array("i"), array("i")
+    blank = array("i", [MISSING]) * N_NODES
+    for n, (train, type_code, node, arrival, departure) in enumerate(rows, 1):
+        if type_code is None or node is None:
+            raise ValueError(f"Row {n}: train type and station are required.")
+        i = index.get(train)
+        if i is None:
+            i = index[train] = len(types)
+            types.append(type_code)
+            arr.extend(blank)
+            dep.extend(blank)
+        elif types[i] != type_code:
+            raise ValueError(f"Row {n}: train {train} is booked as both {TYPE_NAMES[types[i]]} and {TYPE_NAMES[type_code]}.")
+        if arrival is not None:
+            arr[i * N_NODES + node] = arrival
+        if departure is not None:
+            dep[i * N_NODES + node] = departure
+    return index, types, arr, dep
+
+
+def _running_order(index, types, arr, dep):
+    n = len(types)
+    dirs = array("b", bytes(n))
+    sched_arr, sched_dep = array("i", [0]) * (n * N_NODES), array("i", [0]) * (n * N_NODES)
+    for train, i in index.items():
+        base = i * N_NODES
+        known = [node for node in range(N_NODES) if arr[base + node] != MISSING or dep[base + node] != MISSING]
+        if len(known) < 2:
+            raise ValueError(f"Train {train} has fewer than two timing points in the section.")
+        first, last = (max(arr[base + node], dep[base + node]) for node in (known[0], known[-1]))
+        direction = UP if first < last else DOWN
+        nodes = path_nodes(direction)
+        a, d = [arr[base + node] for node in nodes], [dep[base + node] for node in nodes]
+        _fill(a, d, types[i], direction)
+        if any(a[k] > d[k] for k in range(N_NODES)) or any(d[k] > a[k + 1] for k in range(N_NODES - 1)):
+            raise ValueError(f"Train {train} has times that run backwards.")
+        dirs[i] = direction
+        sched_arr[base:base + N_NODES] = array("i", a)
+        sched_dep[base:base + N_NODES] = array("i", d)
+    return list(index), types, dirs, sched_arr, sched_dep
+
+
+def _fill(arr, dep, type_code, direction):
+    """Complete one train's times in running order, in place."""
+    km = [NODES[node]["km"] for node in path_nodes(direction)]
+    for k in range(N_NODES):
+        if arr[k] == MISSING:
+            arr[k] = dep[k]
+        elif dep[k] == MISSING:
+            dep[k] = arr[k]
+    known = [k for k in range(N_NODES) if arr[k] != MISSING]
+    for j, m in zip(known, known[1:]):
+        for k in range(j + 1, m):
+            arr[k] = dep[k] = round(dep[j] + (arr[m] - dep[j]) * (km[k] - km[j]) / (km[m] - km[j]))
+    for k in range(known[0] - 1, -1, -1):
+        arr[k] = dep[k] = arr[k + 1] - _padded_run(type_code, direction, k)
+    for k in range(known[-1] + 1, N_NODES):
+        arr[k] = dep[k] = dep[k - 1] + _padded_run(type_code, direction, k - 1)
+
+
+def _padded_run(type_code, direction, k):
+    return round(run_minutes(type_code, path_block(direction, k)) * (1.0 + RECOVERY_ALLOWANCE))
+
+
+# --- COMPILED IMAGE ---
+# MAGIC, an 8-byte header length, the JSON header, then each column 8-byte aligned at the
+# offset the header gives (from the end of the header).
+def write_image(path, stamp, ids, types, dirs, sched_arr, sched_dep):
+    encoded = [train.encode() for train in ids]
+    width = max(map(len, encoded), default=1)
+    blobs = {
+        "ids": b"".join(train.ljust(width, b"\0") for train in encoded),
+        "types": types.tobytes(), "dirs": dirs.tobytes(),
+        "sched_arr": sched_arr.tobytes(), "sched_dep": sched_dep.tobytes(),
+    }
+    columns, offset = {}, 0
+    for name, blob in blobs.items():
+        columns[name] = (offset, len(blob))
+        offset += -(-len(blob) // 8) * 8
+    header = json.dumps({
+        "stamp": stamp, "n": len(ids), "id_width": width, "nodes": NODE_NAMES, "types": TYPE_NAMES, "columns": columns,
+    }).encode()
+    header += b" " * (-len(header) % 8)
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, "wb") as handle:
+        handle.write(MAGIC + len(header).to_bytes(8, "little") + header)
+        for blob in blobs.values():
+            handle.write(blob + b"\0" * (-len(blob) % 8))
+    os.replace(partial, path)   # atomic, so another process never maps a half-written image
+
+
+def open_image(path, stamp=None):
+    """Timetable over the memory-mapped image at `path`; `stamp`, if given, must match the
+    one it was compiled with."""
+    with open(path, "rb") as handle:
+        image = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(image)
+    if view[:8] != MAGIC:
+        raise ValueError(f"{path} is not a compiled timetable.")
+    length = int.from_bytes(view[8:16], "little")
+    header = json.loads(bytes(view[16:16 + length]))
+    if (stamp is not None and header["stamp"] != stamp) or header["nodes"] != NODE_NAMES or header["types"] != TYPE_NAMES:
+        raise ValueError(f"{path} is out of date.")
+    start = 16 + length
+
+    def column(name, fmt):
+        offset, size = header["columns"][name]
+        return view[start + offset:start + offset + size].cast(fmt)
+
+    width = header["id_width"]
+    raw = column("ids", "B").tobytes()
+    ids = [raw[k:k + width].rstrip(b"\0").decode() for k in range(0, len(raw), width)]
+    return Timetable.mapped(
+        path, ids, column("types", "b"), column("dirs", "b"), column("sched_arr", "i"), column("sched_dep", "i"),
+    )